@@ -0,0 +1,342 @@
+# benchmark.py - Medições de desempenho do jogo de xadrez
+#
+# Uso:
+#   python benchmark.py board [--frames N]
+#   python benchmark.py startup [--games N]
+#   python benchmark.py profile [--frames N] [--no-text-cache]
+#   python benchmark.py engine [--time S]
+#   python benchmark.py perft [--depth N]
+
+import argparse
+import cProfile
+import os
+import pstats
+import subprocess
+import sys
+import time
+
+# Permitir rodar sem janela (ex.: em servidores de CI)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import chess
+import chess.engine
+import pygame
+
+import builtin_engine
+import main
+
+
+def legacy_draw_pieces(board, screen):
+    """Desenho das peças como era antes do cache (smoothscale por casa)"""
+    for square, piece in board.piece_map().items():
+        image = main.PIECE_IMAGES.get(main.piece_image_name(piece))
+        if image:
+            col = chess.square_file(square)
+            row = 7 - chess.square_rank(square)
+            scaled_image = pygame.transform.smoothscale(image, (main.TILE_SIZE, main.TILE_SIZE))
+            screen.blit(scaled_image, (col * main.TILE_SIZE, row * main.TILE_SIZE))
+
+
+def cached_draw_pieces(board, screen):
+    """Desenho das peças usando o cache de sprites"""
+    for square, piece in board.piece_map().items():
+        sprite = main.sprite_cache.get(main.piece_image_name(piece), main.TILE_SIZE)
+        if sprite:
+            col = chess.square_file(square)
+            row = 7 - chess.square_rank(square)
+            screen.blit(sprite, (col * main.TILE_SIZE, row * main.TILE_SIZE))
+
+
+def legacy_draw_board(game, screen):
+    """draw_board como era antes da camada do tabuleiro (superfícies e xeque por casa)"""
+    for square in chess.SQUARES:
+        col = chess.square_file(square)
+        row = 7 - chess.square_rank(square)
+        rect = pygame.Rect(col * main.TILE_SIZE, row * main.TILE_SIZE, main.TILE_SIZE, main.TILE_SIZE)
+        color = main.LIGHT_SQUARE if (col + chess.square_rank(square)) % 2 == 1 else main.DARK_SQUARE
+        pygame.draw.rect(screen, color, rect)
+        highlights = []
+        if game.last_move and square in (game.last_move.from_square, game.last_move.to_square):
+            highlights.append(main.LAST_MOVE_COLOR)
+        if square == game.selected_square:
+            highlights.append(main.SELECTED_COLOR)
+        if game.board.is_check() and square == game.board.king(game.board.turn):
+            highlights.append(main.CHECK_COLOR)
+        for highlight in highlights:
+            s = pygame.Surface((main.TILE_SIZE, main.TILE_SIZE), pygame.SRCALPHA)
+            s.fill(highlight)
+            screen.blit(s, rect)
+        if game.show_valid_moves and square in game.valid_moves:
+            center_x, center_y = rect.center
+            pygame.draw.circle(screen, (0, 0, 0, 100), (center_x + 1, center_y + 1), 6)
+            pygame.draw.circle(screen, main.HIGHLIGHT_COLOR, (center_x, center_y), 6)
+            pygame.draw.circle(screen, (255, 255, 255), (center_x, center_y), 6, 1)
+        piece = game.board.piece_at(square)
+        if piece:
+            sprite = main.sprite_cache.get(main.piece_image_name(piece), main.TILE_SIZE)
+            if sprite:
+                screen.blit(sprite, rect.topleft)
+
+
+def time_frames(draw, frames):
+    """Executa draw() várias vezes e devolve o tempo médio por quadro em ms"""
+    draw()  # Aquecimento (preenche caches)
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw()
+    return (time.perf_counter() - start) * 1000.0 / frames
+
+
+def bench_board(args):
+    main.init_display()
+    main.init_engine()
+    game = main.Game(chess.WHITE, 10)
+    screen = main.screen
+    # Posição com xeque, último lance e peça selecionada (todos os destaques ativos)
+    for uci in ("e2e4", "f7f6", "d2d4", "g7g5", "d1h5"):
+        game.execute_move(chess.Move.from_uci(uci))
+    game.selected_square = chess.E8
+    game.valid_moves = [chess.F7]
+
+    results = [
+        ("peças sem cache (antes)", time_frames(lambda: legacy_draw_pieces(game.board, screen), args.frames)),
+        ("peças com cache (depois)", time_frames(lambda: cached_draw_pieces(game.board, screen), args.frames)),
+        ("draw_board sem camada", time_frames(lambda: legacy_draw_board(game, screen), args.frames)),
+        ("draw_board com camada", time_frames(lambda: game.draw_board(screen), args.frames)),
+    ]
+
+    print(f"Renderização do tabuleiro ({args.frames} quadros, TILE_SIZE={main.TILE_SIZE})")
+    for name, ms in results:
+        print(f"  {name:<28} {ms:8.3f} ms/quadro")
+    print(f"  Ganho nas peças: {results[0][1] / max(results[1][1], 1e-9):.1f}x")
+    print(f"  Ganho no draw_board: {results[2][1] / max(results[3][1], 1e-9):.1f}x")
+
+
+def bench_profile(args):
+    """Perfil (cProfile) de quadros completos: tabuleiro, painel inferior e lateral"""
+    main.init_display()
+    main.init_engine()
+    game = main.Game(chess.WHITE, 10)
+    for uci in ("e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"):
+        game.execute_move(chess.Move.from_uci(uci))
+    screen = main.screen
+    if args.no_text_cache:
+        main.text_cache.capacity = 0  # Cada texto é renderizado de novo (como antes)
+
+    def frame():
+        game.draw_board(screen)
+        game.draw_ui(screen)
+        game.draw_sidebar(screen)
+
+    frame()  # Aquecimento (preenche caches)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(args.frames):
+        frame()
+    profiler.disable()
+    print(f"Perfil de {args.frames} quadros completos (10 funções mais caras por tempo próprio)")
+    pstats.Stats(profiler).sort_stats("tottime").print_stats(10)
+
+
+# Posições de referência para o motor interno: FEN e contagens de perft (profundidade 1, 2, 3...)
+PERFT_POSITIONS = [
+    ("inicial", chess.STARTING_FEN, [20, 400, 8902, 197281]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+    ("posição 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238]),
+    ("posição 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    ("posição 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+]
+
+
+def perft(searcher, board, depth, errors):
+    """Conta folhas usando a ordenação de lances do motor; confere as capturas da busca quiescente"""
+    moves = searcher.ordered_moves(board, None, 0)
+    if len(set(moves)) != len(moves) or set(moves) != set(board.legal_moves):
+        errors.append(f"ordered_moves difere dos lances legais em {board.fen()}")
+    captures = set(searcher.ordered_captures(board))
+    if captures != {move for move in board.legal_moves if board.is_capture(move)}:
+        errors.append(f"ordered_captures difere das capturas legais em {board.fen()}")
+    if depth == 1:
+        return len(moves)
+    total = 0
+    for move in moves:
+        board.push(move)
+        total += perft(searcher, board, depth - 1, errors)
+        board.pop()
+    return total
+
+
+# Mates conhecidos (solução única, sem mate mais curto): FEN, lance-chave e N de "mate em N"
+MATE_POSITIONS = [
+    ("corredor", "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", "Ra8#", 1),
+    ("pastor", "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4", "Qxf7#", 1),
+    ("Morphy", "kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1", "Ra6", 2),
+    ("cavalo", "r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1", "Nf6+", 2),
+    ("dama", "2r3k1/p4p2/3Rp2p/1p2P1pK/8/1P4P1/P3Q2P/1q6 b - - 0 1", "Qg6+", 3),
+    ("torre", "r5rk/5p1p/5R2/4B3/8/8/7P/7K w - - 0 1", "Ra6+", 3),
+]
+
+# Empates pelo histórico da partida com um lado bem melhor: FEN, lances jogados e o lance
+# da raiz que empata (a mesma posição sem o histórico deixa na tabela uma avaliação ganha)
+DRAW_POSITIONS = [
+    ("repetição", "4k1n1/8/8/8/8/8/8/3QK1N1 w - - 0 1", "Nf3 Nf6 Ng1 Ng8 Nf3 Nf6 Ng1", "Ng8"),
+    ("50 lances", "4k3/8/8/8/8/8/8/3QK3 w - - 99 80", "", "Ke2"),
+]
+
+
+def check_mates(searcher):
+    """O motor acha cada mate em N com o lance certo, sem passar da profundidade 2N-1"""
+    failures = 0
+    for name, fen, key_move, mate in MATE_POSITIONS:
+        board = chess.Board(fen)
+        searcher.clear()
+        best, lines = searcher.go(board, max_depth=2 * mate - 1)
+        score = lines[0]["score"].relative if lines else None
+        ok = best == board.parse_san(key_move) and score == chess.engine.Mate(mate)
+        failures += not ok
+        depth = lines[0]["depth"] if lines else 0
+        print(f"  mate em {mate} {name:<10} {board.san(best) if best else '-':>6} {str(score):>4} "
+              f"(esperado {key_move} #+{mate}) d{depth}  {'ok' if ok else 'FALHOU'}")
+    return failures
+
+
+def check_draws(searcher):
+    """Repetição e regra dos 50 lances valem 0 mesmo com a posição na tabela de transposição"""
+    failures = 0
+    for name, fen, moves, drawing_move in DRAW_POSITIONS:
+        board = chess.Board(fen)
+        for san in moves.split():
+            board.push_san(san)
+        move = board.parse_san(drawing_move)
+        child = board.copy()
+        child.push(move)
+        # Primeiro a mesma posição sem histórico: a tabela fica com a avaliação ganha
+        fresh = chess.Board(board.fen())
+        fresh.halfmove_clock = 0
+        searcher.clear()
+        searcher.go(fresh, max_depth=4, root_moves=[move])
+        entry = searcher.tt.get(builtin_engine._key(child))
+        _, lines = searcher.go(board, max_depth=4, root_moves=[move])
+        score = lines[0]["score"].relative if lines else None
+        ok = entry is not None and entry[1] != 0 and score == chess.engine.Cp(0)
+        failures += not ok
+        stored = entry[1] if entry is not None else None
+        print(f"  {name:<17} {drawing_move:>6} {str(score):>4} (na tabela: {stored})  {'ok' if ok else 'FALHOU'}")
+    return failures
+
+
+def bench_perft(args):
+    """Suíte de corretude do motor interno: gerador de lances, mates e empates da busca"""
+    searcher = builtin_engine.Searcher()
+    failures = 0
+    print(f"Perft do motor interno (até profundidade {args.depth})")
+    for name, fen, expected in PERFT_POSITIONS:
+        board = chess.Board(fen)
+        for depth, count in enumerate(expected[:args.depth], 1):
+            errors = []
+            start = time.perf_counter()
+            nodes = perft(searcher, board, depth, errors)
+            elapsed = time.perf_counter() - start
+            ok = nodes == count and not errors
+            failures += not ok
+            print(f"  {name:<10} d{depth} {nodes:>8} (esperado {count:>8}) {elapsed:6.2f} s  {'ok' if ok else 'FALHOU'}")
+            for error in errors[:3]:
+                print(f"    {error}")
+    print("Busca do motor interno")
+    failures += check_mates(searcher)
+    failures += check_draws(searcher)
+    if failures:
+        sys.exit(1)
+
+
+def bench_engine(args):
+    """Nós por segundo do motor interno em posições de referência"""
+    engine = builtin_engine.BuiltinEngine(seed=0)
+    total_nodes = 0
+    total_time = 0.0
+    print(f"Motor interno: {args.time:.1f} s por posição (Skill Level 20)")
+    for name, fen, _ in PERFT_POSITIONS:
+        info = engine.analyse(chess.Board(fen), chess.engine.Limit(time=args.time))
+        nodes, elapsed = info.get("nodes", 0), info.get("time", 0.0)
+        total_nodes += nodes
+        total_time += elapsed
+        print(f"  {name:<10} profundidade {info.get('depth', 0):>2}  {nodes:>8} nós  {info.get('nps', 0):>7} nós/s")
+    print(f"  Média: {int(total_nodes / max(total_time, 1e-9))} nós/s")
+
+
+# Orçamento do caminho sem interface (servidores, testes, lotes)
+IMPORT_BUDGET_MS = 150.0   # Importar chess_core num interpretador novo
+GAME_BUDGET_US = 200.0     # Criar um GameCore e jogar 1. e4 e5
+
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import chess_core
+import_ms = (time.perf_counter() - start) * 1000.0
+assert "pygame" not in sys.modules and "tkinter" not in sys.modules
+import chess
+games = int(sys.argv[1])
+start = time.perf_counter()
+for _ in range(games):
+    game = chess_core.GameCore(chess.WHITE, 10)
+    game.execute_move(chess.Move.from_uci("e2e4"))
+    game.execute_move(chess.Move.from_uci("e7e5"))
+game_us = (time.perf_counter() - start) * 1e6 / games
+print(import_ms, game_us)
+"""
+
+
+def bench_startup(args):
+    """Mede importação e criação de partidas sem pygame, tkinter ou motor"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, str(args.games)],
+                                cwd=script_dir, capture_output=True, text=True, check=True).stdout
+        samples.append(tuple(float(value) for value in output.split()))
+    import_ms = min(sample[0] for sample in samples)
+    game_us = min(sample[1] for sample in samples)
+
+    print(f"Inicialização sem interface ({args.runs} execuções, {args.games} partidas)")
+    print(f"  {'importar chess_core':<28} {import_ms:8.1f} ms   (orçamento {IMPORT_BUDGET_MS:.0f} ms)")
+    print(f"  {'GameCore + 2 lances':<28} {game_us:8.1f} us   (orçamento {GAME_BUDGET_US:.0f} us)")
+    if import_ms > IMPORT_BUDGET_MS or game_us > GAME_BUDGET_US:
+        print("  ACIMA DO ORÇAMENTO")
+        sys.exit(1)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmarks do jogo de xadrez")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    board_parser = sub.add_parser("board", help="Custo de renderização do tabuleiro")
+    board_parser.add_argument("--frames", type=int, default=300)
+    board_parser.set_defaults(func=bench_board)
+
+    startup_parser = sub.add_parser("startup", help="Tempo de importação e criação de partidas sem interface")
+    startup_parser.add_argument("--games", type=int, default=1000)
+    startup_parser.add_argument("--runs", type=int, default=5)
+    startup_parser.set_defaults(func=bench_startup)
+
+    profile_parser = sub.add_parser("profile", help="Perfil de quadros completos")
+    profile_parser.add_argument("--frames", type=int, default=300)
+    profile_parser.add_argument("--no-text-cache", action="store_true", help="Desativar o cache de textos")
+    profile_parser.set_defaults(func=bench_profile)
+
+    engine_parser = sub.add_parser("engine", help="Nós por segundo do motor interno")
+    engine_parser.add_argument("--time", type=float, default=2.0)
+    engine_parser.set_defaults(func=bench_engine)
+
+    perft_parser = sub.add_parser("perft", help="Suíte perft, mates e empates do motor interno")
+    perft_parser.add_argument("--depth", type=int, default=3)
+    perft_parser.set_defaults(func=bench_perft)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    finally:
+        main.shutdown()
+
+
+if __name__ == "__main__":
+    main_cli()
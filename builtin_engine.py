@@ -0,0 +1,584 @@
+# builtin_engine.py - Motor de xadrez em Python puro (usado quando não há Stockfish)
+#
+# Implementa a parte da interface do chess.engine.SimpleEngine que o jogo usa:
+# play(), analyse(), analysis() (interrompível, com info em fluxo), configure()
+# com "Skill Level" e quit(). Busca alfa-beta com aprofundamento iterativo,
+# tabela de transposição, busca quiescente e ordenação MVV-LVA/killers/histórico.
+
+import queue
+import random
+import threading
+import time
+
+import chess
+import chess.engine
+
+ENGINE_NAME = "Motor interno (Python)"
+
+MATE = 100000
+MAX_PLY = 64
+INFINITY = MATE + 1
+
+# Valores das peças em centipeões
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330,
+                chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+
+# Tabelas peça-casa do ponto de vista das brancas, da 8ª fileira (a8) para a 1ª (h1)
+PST = {
+    chess.PAWN: [
+        0,   0,   0,   0,   0,   0,   0,   0,
+        50,  50,  50,  50,  50,  50,  50,  50,
+        10,  10,  20,  30,  30,  20,  10,  10,
+        5,   5,  10,  25,  25,  10,   5,   5,
+        0,   0,   0,  20,  20,   0,   0,   0,
+        5,  -5, -10,   0,   0, -10,  -5,   5,
+        5,  10,  10, -20, -20,  10,  10,   5,
+        0,   0,   0,   0,   0,   0,   0,   0],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20],
+    chess.ROOK: [
+        0,   0,   0,   0,   0,   0,   0,   0,
+        5,  10,  10,  10,  10,  10,  10,   5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        0,   0,   0,   5,   5,   0,   0,   0],
+    chess.QUEEN: [
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+        -5,   0,   5,   5,   5,   5,   0,  -5,
+        0,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20,  20,   0,   0,   0,   0,  20,  20,
+        20,  30,  10,   0,   0,  10,  30,  20],
+}
+KING_ENDGAME_PST = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+ENDGAME_MATERIAL = 1300  # Material sem peões (por lado) abaixo do qual o rei se centraliza
+
+
+def _square_table(table, color):
+    """Tabela indexada pelas casas do python-chess (a1 = 0) para uma cor"""
+    if color == chess.WHITE:
+        return [table[square ^ 56] for square in chess.SQUARES]
+    return [table[square] for square in chess.SQUARES]
+
+
+# Valor da peça + bônus da casa, por cor, tipo e casa
+SQUARE_VALUES = {
+    color: {piece_type: [PIECE_VALUES[piece_type] + value for value in _square_table(PST[piece_type], color)]
+            for piece_type in PIECE_VALUES}
+    for color in chess.COLORS
+}
+KING_ENDGAME_VALUES = {color: _square_table(KING_ENDGAME_PST, color) for color in chess.COLORS}
+
+
+def skill_limits(level):
+    """Limite de nós, profundidade máxima e ruído (cp) de cada nível 0-20 do menu"""
+    level = max(0, min(20, int(level)))
+    nodes = int(300 * 1.4 ** level)   # ~300 nós no nível 0, ~250 mil no 20
+    depth = 1 + level // 2            # 1 a 11 lances de profundidade
+    noise = (20 - level) * 8          # Erro aleatório na escolha da jogada da raiz
+    return nodes, depth, noise
+
+
+def evaluate(board):
+    """Avaliação estática em centipeões, do ponto de vista de quem joga"""
+    score = 0
+    non_pawn = {chess.WHITE: 0, chess.BLACK: 0}
+    for color in chess.COLORS:
+        sign = 1 if color == chess.WHITE else -1
+        tables = SQUARE_VALUES[color]
+        for piece_type in (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN):
+            table = tables[piece_type]
+            mask = board.pieces_mask(piece_type, color)
+            for square in chess.scan_forward(mask):
+                score += sign * table[square]
+            if piece_type != chess.PAWN:
+                non_pawn[color] += PIECE_VALUES[piece_type] * chess.popcount(mask)
+    endgame = non_pawn[chess.WHITE] <= ENDGAME_MATERIAL and non_pawn[chess.BLACK] <= ENDGAME_MATERIAL
+    for color in chess.COLORS:
+        king = board.king(color)
+        if king is not None:
+            table = KING_ENDGAME_VALUES[color] if endgame else SQUARE_VALUES[color][chess.KING]
+            score += table[king] if color == chess.WHITE else -table[king]
+    return score if board.turn == chess.WHITE else -score
+
+
+def _key(board):
+    # Chave de transposição do próprio python-chess (bem mais barata que o hash Zobrist)
+    return board._transposition_key()
+
+
+class SearchAborted(Exception):
+    pass
+
+
+class Searcher:
+    """Alfa-beta com aprofundamento iterativo e tabela de transposição"""
+    EXACT, LOWER, UPPER = 0, 1, 2
+
+    def __init__(self, hash_mb=16):
+        self.tt = {}
+        self.tt_capacity = max(1, hash_mb) * 8000
+        self.stop_event = threading.Event()  # O da busca atual (cada análise traz o seu)
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.killers = [[] for _ in range(MAX_PLY + 8)]
+        self.history = {}
+        self.path = set()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def clear(self):
+        self.tt.clear()
+
+    # --- Ordenação de lances ---
+
+    def ordered_moves(self, board, tt_move, ply):
+        """Todos os lances legais, do mais promissor ao menos promissor"""
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+        scored = []
+        for move in board.legal_moves:
+            if move == tt_move:
+                score = 10000000
+            elif board.is_capture(move):
+                # MVV-LVA: vítima mais valiosa primeiro, atacante mais barato primeiro
+                victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+                attacker = board.piece_type_at(move.from_square)
+                score = 1000000 + PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker] // 10
+            elif move.promotion:
+                score = 900000 + PIECE_VALUES[move.promotion]
+            elif move in killers:
+                score = 800000
+            else:
+                score = history.get((board.turn, move.from_square, move.to_square), 0)
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def ordered_captures(self, board):
+        scored = []
+        for move in board.generate_legal_captures():
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            attacker = board.piece_type_at(move.from_square)
+            scored.append((PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker] // 10, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    # --- Busca ---
+
+    def check_limits(self):
+        if self.stop_event.is_set():
+            raise SearchAborted()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchAborted()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+
+    def quiesce(self, board, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 127 == 0:
+            self.check_limits()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        for move in self.ordered_captures(board):
+            board.push(move)
+            score = -self.quiesce(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def search(self, board, depth, alpha, beta, ply, allow_null=True):
+        self.nodes += 1
+        if self.nodes & 127 == 0:
+            self.check_limits()
+
+        key = _key(board)
+        if ply > 0:
+            # Repetição dentro da linha (ou do jogo) e regra dos 50 lances contam como empate
+            if key in self.path or board.halfmove_clock >= 100:
+                return 0
+            # Distância até o mate limita a janela
+            alpha = max(alpha, -MATE + ply)
+            beta = min(beta, MATE - ply - 1)
+            if alpha >= beta:
+                return alpha
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1  # Extensão de xeque
+        if depth <= 0:
+            return self.quiesce(board, alpha, beta, ply)
+
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            if ply > 0 and entry_depth >= depth:
+                if entry_flag == self.EXACT:
+                    return entry_score
+                if entry_flag == self.LOWER and entry_score >= beta:
+                    return entry_score
+                if entry_flag == self.UPPER and entry_score <= alpha:
+                    return entry_score
+
+        # Lance nulo: se passar a vez já basta para o corte, a posição é boa demais
+        if allow_null and not in_check and depth >= 3 and ply > 0 and \
+           board.occupied_co[board.turn] & ~(board.pawns | board.kings):
+            board.push(chess.Move.null())
+            self.path.add(key)
+            try:
+                score = -self.search(board, depth - 3, -beta, -beta + 1, ply + 1, False)
+            finally:
+                self.path.discard(key)
+                board.pop()
+            if score >= beta:
+                return beta
+
+        moves = self.ordered_moves(board, tt_move, ply)
+        if not moves:
+            return -MATE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        self.path.add(key)
+        try:
+            for move in moves:
+                board.push(move)
+                try:
+                    score = -self.search(board, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    board.pop()
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    if not board.is_capture(move) and not move.promotion:
+                        self.add_killer(move, ply)
+                        history_key = (board.turn, move.from_square, move.to_square)
+                        self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+                    break
+        finally:
+            self.path.discard(key)
+
+        if best_score <= original_alpha:
+            flag = self.UPPER
+        elif best_score >= beta:
+            flag = self.LOWER
+        else:
+            flag = self.EXACT
+        self.store(key, depth, best_score, flag, best_move)
+        return best_score
+
+    def add_killer(self, move, ply):
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+    def store(self, key, depth, score, flag, move):
+        if len(self.tt) >= self.tt_capacity and key not in self.tt:
+            self.tt.clear()
+        self.tt[key] = (depth, score, flag, move)
+
+    def principal_variation(self, board, first_move, max_length):
+        """Segue a tabela de transposição a partir de um lance da raiz"""
+        pv = [first_move]
+        board = board.copy(stack=False)
+        board.push(first_move)
+        seen = {_key(board)}
+        while len(pv) < max_length:
+            entry = self.tt.get(_key(board))
+            if entry is None or entry[3] is None or not board.is_legal(entry[3]):
+                break
+            pv.append(entry[3])
+            board.push(entry[3])
+            key = _key(board)
+            if key in seen:
+                break
+            seen.add(key)
+        return pv
+
+    def root_search(self, board, moves, depth, multipv):
+        """Pontua os lances da raiz; os multipv melhores recebem valor exato"""
+        results = []
+        key = _key(board)
+        self.path.add(key)
+        try:
+            for move in moves:
+                # Limite inferior: o pior dos multipv melhores até agora
+                ranked = sorted((score for score, _ in results), reverse=True)
+                alpha = ranked[multipv - 1] if len(ranked) >= multipv else -INFINITY
+                board.push(move)
+                try:
+                    score = -self.search(board, depth - 1, -INFINITY, -alpha, 1)
+                finally:
+                    board.pop()
+                results.append((score, move))
+        finally:
+            self.path.discard(key)
+        results.sort(key=lambda item: item[0], reverse=True)
+        if results:
+            self.store(key, depth, results[0][0], self.EXACT, results[0][1])
+        return results
+
+    def go(self, board, max_depth=None, max_time=None, max_nodes=None, multipv=1,
+           root_moves=None, noise=0, on_info=None, rng=None, stop_event=None):
+        """Aprofundamento iterativo; devolve (melhor lance, lista de linhas)"""
+        start = time.perf_counter()
+        # Um stop() pedido antes de a busca começar continua valendo (o evento não é zerado aqui)
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.deadline = start + max_time if max_time is not None else None
+        self.killers = [[] for _ in range(MAX_PLY + 8)]
+        self.history = {}
+        board = board.copy()
+
+        # Posições do jogo desde o último lance irreversível (para repetições)
+        self.path = set()
+        history_board = board.copy()
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            history_board.pop()
+            self.path.add(_key(history_board))
+
+        moves = [move for move in board.legal_moves if not root_moves or move in root_moves]
+        if not moves:
+            return None, []
+        multipv = max(1, min(multipv, len(moves)))
+        # Com erro aleatório, alguns lances a mais precisam de valor exato para o sorteio
+        exact = min(max(multipv, 4 if noise else 1), len(moves))
+        lines = []
+        max_depth = max_depth or MAX_PLY
+        for depth in range(1, max_depth + 1):
+            try:
+                results = self.root_search(board, moves, depth, exact)
+            except SearchAborted:
+                break
+            # Próxima iteração começa pelos melhores lances desta
+            moves = [move for _, move in results]
+            elapsed = time.perf_counter() - start
+            lines = []
+            for rank, (score, move) in enumerate(results[:exact], 1):
+                lines.append({
+                    "multipv": rank,
+                    "depth": depth,
+                    "score": chess.engine.PovScore(_engine_score(score), board.turn),
+                    "pv": self.principal_variation(board, move, depth),
+                    "nodes": self.nodes,
+                    "time": elapsed,
+                    "nps": int(self.nodes / elapsed) if elapsed > 0 else 0,
+                })
+            if on_info is not None:
+                for line in lines[:multipv]:
+                    on_info(dict(line))
+            if abs(results[0][0]) >= MATE - MAX_PLY:
+                break  # Mate encontrado: aprofundar não muda o lance
+            # Sem tempo para completar outra iteração
+            if self.deadline is not None and elapsed > (self.deadline - start) * 0.5:
+                break
+
+        if not lines:
+            # Nem a primeira iteração terminou: qualquer lance legal serve
+            return moves[0], []
+        best = lines[0]["pv"][0]
+        if noise and len(lines) > 1:
+            # Nível de habilidade baixo: escolher com erro aleatório entre as linhas
+            rng = rng or random
+            noisy = [(_white_cp(line) * (1 if board.turn == chess.WHITE else -1) + rng.uniform(0, noise), line)
+                     for line in lines]
+            best = max(noisy, key=lambda item: item[0])[1]["pv"][0]
+        return best, lines[:multipv]
+
+
+def _engine_score(score):
+    if score >= MATE - MAX_PLY:
+        return chess.engine.Mate((MATE - score + 1) // 2)
+    if score <= -MATE + MAX_PLY:
+        return chess.engine.Mate(-((MATE + score + 1) // 2))
+    return chess.engine.Cp(score)
+
+
+def _white_cp(line):
+    return line["score"].white().score(mate_score=MATE)
+
+
+class BuiltinAnalysis:
+    """Busca em andamento; imita chess.engine.SimpleAnalysisResult"""
+    def __init__(self, engine, board, limit, multipv, root_moves):
+        self.engine = engine
+        self.info = {}
+        self.multipv = [{}]
+        self.infos = queue.Queue()
+        self.best = None
+        self.error = None
+        self.finished = threading.Event()
+        self.stop_event = threading.Event()  # Criado antes da thread: stop() nunca se perde
+        self.thread = threading.Thread(target=self._run, args=(board, limit, multipv, root_moves),
+                                       name="builtin-engine", daemon=True)
+        self.thread.start()
+
+    def _run(self, board, limit, multipv, root_moves):
+        try:
+            move, lines = self.engine.search(board, limit, multipv, root_moves, self._on_info, self.stop_event)
+            ponder = lines[0]["pv"][1] if lines and len(lines[0]["pv"]) > 1 and lines[0]["pv"][0] == move else None
+            self.best = chess.engine.BestMove(move, ponder)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished.set()
+            self.infos.put(None)
+
+    def _on_info(self, info):
+        rank = info.get("multipv", 1)
+        while len(self.multipv) < rank:
+            self.multipv.append({})
+        self.multipv[rank - 1] = info
+        if rank == 1:
+            self.info = info
+        self.infos.put(info)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def wait(self):
+        self.thread.join()
+        if self.error is not None:
+            raise chess.engine.EngineError(f"erro no motor interno: {self.error}") from self.error
+        return self.best
+
+    def get(self):
+        info = self.infos.get()
+        if info is None:
+            self.infos.put(None)
+            raise chess.engine.AnalysisComplete()
+        return info
+
+    def empty(self):
+        return self.infos.empty()
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.get()
+            except chess.engine.AnalysisComplete:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        self.thread.join()
+
+
+class BuiltinEngine:
+    """Substituto do SimpleEngine do Stockfish com o motor interno"""
+    def __init__(self, seed=None):
+        self.id = {"name": ENGINE_NAME}
+        self.config = {"Skill Level": 20, "Threads": 1, "Hash": 16}
+        self.searcher = Searcher(self.config["Hash"])
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()  # Uma busca por vez (como um processo UCI)
+        self.game = None  # Partida da última busca (game= do chess.engine)
+
+    def configure(self, options):
+        for name, value in options.items():
+            if name not in self.config:
+                raise chess.engine.EngineError(f"opção não suportada pelo motor interno: {name}")
+            self.config[name] = value
+        if "Hash" in options:
+            self.searcher = Searcher(int(self.config["Hash"]))
+
+    def search(self, board, limit, multipv=1, root_moves=None, on_info=None, stop_event=None):
+        """Busca com os limites do pedido e do nível de habilidade"""
+        skill_nodes, skill_depth, noise = skill_limits(self.config["Skill Level"])
+        limit = limit or chess.engine.Limit()
+        max_time = limit.time
+        if max_time is None:
+            clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+            increment = (limit.white_inc if board.turn == chess.WHITE else limit.black_inc) or 0
+            if clock is not None:
+                max_time = clock / 40 + increment * 0.8
+        max_nodes = min(limit.nodes, skill_nodes) if limit.nodes else skill_nodes
+        max_depth = min(limit.depth, skill_depth) if limit.depth else skill_depth
+        if limit.time is None and limit.nodes is None and limit.depth is None and max_time is None:
+            # Análise infinita: só para com stop()
+            max_nodes, max_depth = None, None
+        with self.lock:
+            return self.searcher.go(board, max_depth, max_time, max_nodes, multipv or 1,
+                                    root_moves, noise, on_info, self.rng, stop_event)
+
+    def analysis(self, board, limit=None, *, multipv=None, root_moves=None, game=None, **kwargs):
+        if game is not None and game != self.game:
+            # Partida nova (como ucinewgame): nada da anterior fica na tabela de transposição
+            with self.lock:
+                self.game = game
+                self.searcher.clear()
+        return BuiltinAnalysis(self, board.copy(), limit, multipv or 1, root_moves)
+
+    def analyse(self, board, limit, *, multipv=None, root_moves=None, game=None, **kwargs):
+        with self.analysis(board, limit, multipv=multipv, root_moves=root_moves, game=game) as analysis:
+            analysis.wait()
+            if multipv:
+                return list(analysis.multipv)
+            return dict(analysis.info)
+
+    def play(self, board, limit, *, root_moves=None, game=None, **kwargs):
+        with self.analysis(board, limit, root_moves=root_moves, game=game) as analysis:
+            best = analysis.wait()
+            return chess.engine.PlayResult(best.move, best.ponder, dict(analysis.info))
+
+    def quit(self):
+        self.searcher.stop()
+
+    def close(self):
+        self.quit()
@@ -0,0 +1,339 @@
+# chess_core.py - Regras da partida sem interface gráfica (sem pygame, tkinter ou motor)
+#
+# Importar este módulo não abre janela, não carrega imagens e não inicia o
+# Stockfish; pode ser usado em servidores, testes e processamento em lote.
+
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+from time_control import ChessClock
+
+PROMOTION_PIECES = ['queen', 'rook', 'bishop', 'knight']
+STARTING_POSITION = chess.Board()  # Só para comparação (nunca modificado)
+SNAPSHOT_INTERVAL = 16  # Meias-jogadas entre cópias do tabuleiro guardadas para navegar
+
+
+def new_record_id():
+    return os.urandom(8).hex()
+
+
+class MoveIndex:
+    """Lances legais de uma posição agrupados por casa de origem e destino"""
+    def __init__(self, board):
+        self.board = board.copy(stack=False)  # Só para gerar SAN sob demanda
+        self.moves = {}  # origem -> {destino: [lances]} (várias promoções por destino)
+        self.sans = {}
+        for move in board.legal_moves:
+            self.moves.setdefault(move.from_square, {}).setdefault(move.to_square, []).append(move)
+
+    def destinations(self, from_square):
+        """Casas de destino legais a partir de uma casa"""
+        return list(self.moves.get(from_square, ()))
+
+    def __contains__(self, move):
+        return move in self.moves.get(move.from_square, {}).get(move.to_square, ())
+
+    def is_promotion(self, from_square, to_square):
+        return any(move.promotion for move in self.moves.get(from_square, {}).get(to_square, ()))
+
+    def san(self, move):
+        san = self.sans.get(move)
+        if san is None:
+            san = self.board.san(move)
+            self.sans[move] = san
+        return san
+
+
+class GameCore:
+    """Estado e regras de uma partida: lances, promoção, histórico e resultado"""
+    MOVE_INDEX_CAPACITY = 64
+
+    def __init__(self, player_color=chess.WHITE, difficulty_level=10, board=None, time_control=None):
+        self.board = board if board is not None else chess.Board()
+        self.player_color = player_color  # chess.WHITE ou chess.BLACK
+        self.difficulty_level = difficulty_level  # Armazenar o nível de dificuldade
+        self.game_over = False
+        self.message = ""
+        self.last_move = None  # Último movimento realizado
+        self.analysis_mode = False  # Modo de análise após o fim do jogo
+        self.move_indexes = OrderedDict()  # Hash Zobrist -> MoveIndex (posições recentes)
+        self.current_index = None  # MoveIndex da posição atual, se já foi pedido
+        self.game = self.new_record()  # Árvore PGN da partida (com variantes), mantida a cada lance
+        self.record_id = new_record_id()  # Identifica a partida no banco de partidas (entre salvamentos)
+        self.node = self.node_for_board()  # Nó da árvore que corresponde à posição atual
+        self.clock = None  # ChessClock (None = partida sem relógio)
+        if time_control is not None:
+            base, increment = time_control
+            self.clock = ChessClock(base, increment)
+            self.clock.start(self.board.turn)
+
+    def new_record(self):
+        """Árvore PGN vazia com os cabeçalhos da partida, a partir da posição inicial do tabuleiro"""
+        game = chess.pgn.Game()
+        game.headers["Event"] = "Partida de Xadrez"
+        game.headers["Site"] = "Jogo Local"
+        game.headers["Date"] = datetime.now().strftime("%Y.%m.%d")
+        game.headers["Round"] = "1"
+        game.headers["White"] = "Jogador" if self.player_color == chess.WHITE else "Stockfish"
+        game.headers["Black"] = "Stockfish" if self.player_color == chess.WHITE else "Jogador"
+        root = self.board.root() if self.board.move_stack else self.board
+        if root != STARTING_POSITION:
+            game.setup(root)
+        return game
+
+    def node_for_board(self):
+        """Registra na árvore os lances que o tabuleiro recebido já tinha (normalmente nenhum)"""
+        root = self.board.root() if self.board.move_stack else self.board
+        self.start_line(self.game, root)
+        replay = root.copy(stack=False)
+        for move in self.board.move_stack:
+            san = replay.san(move)
+            replay.push(move)
+            self.extend_line(self.line[-1].add_variation(move), san, replay)
+        self.ply = len(self.line) - 1
+        return self.line[-1]
+
+    def start_line(self, game, root):
+        """Linha atual vazia a partir da raiz (nós, SAN e cópias periódicas do tabuleiro)"""
+        self.line = [game]  # Nós da raiz até a ponta da linha; self.ply indica a posição atual
+        self.line_sans = []  # SAN de cada lance da linha
+        # Meia-jogada múltipla de SNAPSHOT_INTERVAL -> tabuleiro (a posição inicial padrão não é copiada)
+        self.snapshots = {0: STARTING_POSITION if root == STARTING_POSITION else root.copy(stack=False)}
+        self.root_turn = root.turn
+        self.root_fullmove = root.fullmove_number
+        self.ply = 0
+
+    def extend_line(self, node, san, board):
+        """Acrescenta um nó à ponta da linha; `board` é a posição depois do lance"""
+        self.line.append(node)
+        self.line_sans.append(san)
+        ply = len(self.line) - 1
+        if ply % SNAPSHOT_INTERVAL == 0:
+            self.snapshots[ply] = board.copy(stack=False)
+
+    @property
+    def move_history(self):
+        """Histórico da linha atual ("1. e4 e5", ...)"""
+        return self.history_entries(0, self.history_length())
+
+    def history_length(self):
+        """Quantidade de jogadas (linhas do histórico) da linha atual"""
+        return (len(self.line_sans) + (self.root_turn == chess.BLACK) + 1) // 2
+
+    def history_row(self, ply):
+        """Linha do histórico que contém o lance de número `ply` (a partir de 1)"""
+        return (ply - 1 + (self.root_turn == chess.BLACK)) // 2
+
+    def history_entries(self, first, last):
+        """Textos das jogadas first..last-1 do histórico (só as pedidas são formatadas)"""
+        offset = 1 if self.root_turn == chess.BLACK else 0
+        entries = []
+        for row in range(first, min(last, self.history_length())):
+            number = self.root_fullmove + row
+            white = 2 * row - offset
+            if white < 0:
+                # Partida que começa com as pretas (posição carregada)
+                entries.append(f"{number}... {self.line_sans[0]}")
+            elif white + 1 < len(self.line_sans):
+                entries.append(f"{number}. {self.line_sans[white]} {self.line_sans[white + 1]}")
+            else:
+                entries.append(f"{number}. {self.line_sans[white]}")
+        return entries
+
+    def record_move(self, move, move_san):
+        """Avança na árvore: reaproveita a variante do lance ou cria uma nova"""
+        if self.ply + 1 < len(self.line) and self.line[self.ply + 1].move == move:
+            self.node = self.line[self.ply + 1]  # Mesmo lance da linha: nada muda adiante
+            return
+        for variation in self.node.variations:
+            if variation.move == move:
+                self.node = variation
+                break
+        else:
+            parent = self.node
+            self.node = parent.add_variation(move)
+            # Fora do modo de análise o lance novo vira a linha principal
+            if not self.analysis_mode:
+                parent.promote_to_main(move)
+        # Ramificar: só a parte da linha depois da posição atual é descartada
+        del self.line[self.ply + 1:]
+        del self.line_sans[self.ply:]
+        for ply in [ply for ply in self.snapshots if ply > self.ply]:
+            del self.snapshots[ply]
+        self.line.append(self.node)
+        self.line_sans.append(move_san)
+
+    def position_changed(self):
+        """Descarta o que foi calculado para a posição anterior"""
+        self.current_index = None
+
+    def move_index(self):
+        """Índice de lances da posição atual, gerado uma vez por posição"""
+        if self.current_index is None:
+            key = chess.polyglot.zobrist_hash(self.board)
+            index = self.move_indexes.get(key)
+            if index is None:
+                index = MoveIndex(self.board)
+                self.move_indexes[key] = index
+                if len(self.move_indexes) > self.MOVE_INDEX_CAPACITY:
+                    self.move_indexes.popitem(last=False)
+            else:
+                self.move_indexes.move_to_end(key)
+            self.current_index = index
+        return self.current_index
+
+    def is_promotion(self, move):
+        """Se o lance leva um peão à última fileira (falta escolher a peça)"""
+        return self.move_index().is_promotion(move.from_square, move.to_square)
+
+    @staticmethod
+    def promotion_move(move, piece_name):
+        """Lance de promoção para a peça escolhida ('queen', 'rook'...)"""
+        return chess.Move(move.from_square, move.to_square, promotion=getattr(chess, piece_name.upper()))
+
+    def execute_move(self, move):
+        """Executa um movimento e atualiza o histórico; devolve a notação SAN"""
+        # Converter movimento para notação algébrica (pelo índice, se já existir)
+        index = self.current_index
+        move_san = index.san(move) if index is not None else self.board.san(move)
+
+        # Adicionar à árvore e ao histórico
+        self.record_move(move, move_san)
+
+        # Executar movimento
+        self.board.push(move)
+        self.ply += 1
+        if self.ply % SNAPSHOT_INTERVAL == 0:
+            self.snapshots[self.ply] = self.board.copy(stack=False)
+        self.last_move = move
+        self.position_changed()
+        if self.clock is not None:
+            self.clock.press()
+
+        # Verificar fim de jogo
+        if self.board.is_game_over():
+            self.game_over = True
+            self.set_game_result()
+            self.game.headers["Result"] = self.board.result()
+            if self.clock is not None:
+                self.clock.stop()
+        return move_san
+
+    def check_clock(self):
+        """Encerra a partida se o tempo de quem joga acabou; devolve True nesse caso"""
+        if self.clock is None or self.game_over:
+            return False
+        color = self.clock.flagged()
+        if color is None:
+            return False
+        self.game_over = True
+        self.clock.stop()
+        loser = "Brancas" if color == chess.WHITE else "Pretas"
+        if self.board.has_insufficient_material(not color):
+            self.message = f"Tempo esgotado das {loser}! Empate (material insuficiente)"
+            self.game.headers["Result"] = "1/2-1/2"
+        else:
+            winner = "Pretas" if color == chess.WHITE else "Brancas"
+            self.message = f"Tempo esgotado das {loser}! {winner} vencem!"
+            self.game.headers["Result"] = "0-1" if color == chess.WHITE else "1-0"
+        self.game.headers["Termination"] = "time forfeit"
+        return True
+
+    def set_game_result(self):
+        if self.board.is_checkmate():
+            winner = "Brancas" if not self.board.turn else "Pretas"
+            self.message = f"Xeque-mate! {winner} vencem!"
+        elif self.board.is_stalemate():
+            self.message = "Empate por afogamento!"
+        elif self.board.is_insufficient_material():
+            self.message = "Empate por material insuficiente!"
+        elif self.board.is_seventyfive_moves():
+            self.message = "Empate por regra das 75 jogadas!"
+        elif self.board.is_fivefold_repetition():
+            self.message = "Empate por repetição quádrupla!"
+        else:
+            self.message = f"Jogo terminado: {self.board.result()}"
+
+    def get_difficulty_name(self):
+        # Usar o nível de dificuldade armazenado
+        level = self.difficulty_level
+        if level <= 2:
+            return "Muito Fácil"
+        elif level <= 7:
+            return "Fácil"
+        elif level <= 12:
+            return "Médio"
+        elif level <= 17:
+            return "Difícil"
+        else:
+            return "Muito Difícil"
+
+    def to_pgn(self):
+        """A partida atual como chess.pgn.Game (a própria árvore, sem reconstrução)"""
+        return self.game
+
+    def turn_at(self, ply):
+        """Lado que joga depois de `ply` lances da linha"""
+        return self.root_turn if ply % 2 == 0 else not self.root_turn
+
+    def board_at(self, ply):
+        """Tabuleiro depois de `ply` lances: cópia guardada mais próxima e poucos lances refeitos"""
+        base = ply - ply % SNAPSHOT_INTERVAL
+        while True:
+            board = self.snapshots[base].copy(stack=False)
+            for node in self.line[base + 1:ply + 1]:
+                board.push(node.move)
+            # Repetições só dependem dos lances desde o último irreversível (no máximo 100),
+            # então o tempo não cresce com o tamanho da partida
+            if base == 0 or board.halfmove_clock <= ply - base:
+                return board
+            base -= SNAPSHOT_INTERVAL
+
+    def seek(self, ply):
+        """Vai para a posição depois de `ply` lances da linha atual; devolve True se mudou"""
+        if ply == len(self.line) and self.ply == ply - 1 and self.node.variations:
+            # Além da ponta: seguir a continuação principal já registrada na árvore
+            child = self.node.variations[0]
+            san = self.board.san(child.move)
+            self.board.push(child.move)
+            self.extend_line(child, san, self.board)
+        else:
+            ply = max(0, min(ply, len(self.line) - 1))
+            if ply == self.ply:
+                return False
+            if ply == self.ply + 1:
+                self.board.push(self.line[ply].move)
+            elif ply == self.ply - 1 and self.board.move_stack:
+                self.board.pop()
+            else:
+                self.board = self.board_at(ply)
+        self.ply = ply
+        self.node = self.line[ply]
+        self.last_move = self.node.move if ply else None
+        self.position_changed()
+        return True
+
+    def load_pgn(self, handle):
+        """Carrega a primeira partida de um arquivo PGN aberto; devolve True se leu"""
+        game = chess.pgn.read_game(handle)
+        if not game:
+            return False
+        # Uma passada pela linha principal refaz o tabuleiro e o histórico
+        self.game = game
+        self.record_id = new_record_id()
+        self.board = game.board()
+        self.start_line(game, self.board)
+        for node in game.mainline():
+            san = self.board.san(node.move)
+            self.board.push(node.move)
+            self.extend_line(node, san, self.board)
+        self.ply = len(self.line) - 1
+        self.node = self.line[-1]
+        self.last_move = self.board.peek() if self.board.move_stack else None
+        self.position_changed()
+        return True
@@ -0,0 +1,153 @@
+# engine_pool.py - Vários processos do Stockfish compartilhados entre partidas
+
+import queue
+import threading
+from contextlib import contextmanager
+
+import chess.engine
+
+from builtin_engine import BuiltinEngine
+
+# Opções que toda concessão (lease) fixa, para uma partida não herdar as da outra
+DEFAULT_LEASE_OPTIONS = {"Skill Level": 20, "Threads": 1, "Hash": 16}
+
+
+class EngineLease:
+    """Configuração própria de uma partida sobre os motores do pool"""
+    def __init__(self, pool, options=None):
+        self.pool = pool
+        self.options = dict(DEFAULT_LEASE_OPTIONS)
+        if options:
+            self.options.update(options)
+
+    def configure(self, options):
+        """Altera as opções desta concessão (aplicadas na próxima busca)"""
+        self.options.update(options)
+
+    @contextmanager
+    def acquire(self):
+        """Empresta um motor já configurado com as opções desta concessão"""
+        engine = self.pool.acquire(self.options)
+        try:
+            yield engine
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError):
+            self.pool.release(engine, broken=True)
+            raise
+        except BaseException:
+            self.pool.release(engine)
+            raise
+        else:
+            self.pool.release(engine)
+
+    def play(self, board, limit, **kwargs):
+        with self.acquire() as engine:
+            return engine.play(board, limit, **kwargs)
+
+    def analyse(self, board, limit, **kwargs):
+        with self.acquire() as engine:
+            return engine.analyse(board, limit, **kwargs)
+
+
+class EnginePool:
+    """Conjunto de até `size` processos UCI iniciados sob demanda (motor interno se engine_path for None)"""
+    def __init__(self, engine_path, size=2):
+        self.engine_path = engine_path
+        self.size = size
+        self.idle = queue.LifoQueue()  # LIFO: reaproveitar o motor "quente"
+        self.applied = {}  # id(engine) -> opções já enviadas ao processo
+        self.started = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def start(self):
+        """Inicia um processo imediatamente (para detectar erros cedo)"""
+        with self.lock:
+            self.started += 1
+        try:
+            engine = self._spawn()
+        except Exception:
+            with self.lock:
+                self.started -= 1
+            raise
+        self.idle.put(engine)
+
+    def lease(self, options=None):
+        return EngineLease(self, options)
+
+    def acquire(self, options):
+        """Retira um motor livre (ou inicia um novo) e aplica as opções"""
+        while True:
+            try:
+                engine = self.idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            with self.lock:
+                spawn = self.started < self.size
+                if spawn:
+                    self.started += 1
+            if spawn:
+                try:
+                    engine = self._spawn()
+                except Exception:
+                    with self.lock:
+                        self.started -= 1
+                    raise
+                break
+            # Esperar um motor livre (ou uma vaga, se algum processo morrer)
+            try:
+                engine = self.idle.get(timeout=0.5)
+                break
+            except queue.Empty:
+                continue
+
+        # Enviar apenas as opções que mudaram desde o último uso deste processo
+        applied = self.applied[id(engine)]
+        changed = {name: value for name, value in options.items() if applied.get(name) != value}
+        if changed:
+            try:
+                engine.configure(changed)
+            except Exception:
+                self.release(engine, broken=True)
+                raise
+            applied.update(changed)
+        return engine
+
+    def release(self, engine, broken=False):
+        """Devolve o motor ao pool; processos com defeito são substituídos"""
+        if broken or self.closed:
+            self.applied.pop(id(engine), None)
+            try:
+                engine.quit()
+            except Exception:
+                pass
+            with self.lock:
+                self.started -= 1
+            return
+        self.idle.put(engine)
+
+    def close(self):
+        """Encerra todos os processos livres"""
+        self.closed = True
+        while True:
+            try:
+                engine = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self.applied.pop(id(engine), None)
+            try:
+                engine.quit()
+            except Exception:
+                pass
+
+    @property
+    def builtin(self):
+        return self.engine_path is None
+
+    def _spawn(self):
+        if self.builtin:
+            engine = BuiltinEngine()
+        else:
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        self.applied[id(engine)] = {}
+        return engine
@@ -0,0 +1,186 @@
+# engine_worker.py - Buscas do motor de xadrez fora do loop de quadros
+
+import itertools
+import queue
+import threading
+import time
+
+
+class EngineRequest:
+    """Pedido de busca enviado ao EngineWorker"""
+    def __init__(self, request_id, kind, lease, board, limit, owner, options):
+        self.request_id = request_id
+        self.kind = kind          # "play", "analyse", "hint" ou "stream" (análise contínua)
+        self.lease = lease        # Concessão do pool (opções da partida)
+        self.board = board        # Cópia do tabuleiro (o original continua mudando)
+        self.limit = limit
+        self.owner = owner        # Quem pediu (usado para cancelar)
+        self.options = options
+        self.cancelled = False
+        self.stop_requested = False  # Parar cedo mas entregar o resultado
+        self.latest = None        # "stream": linhas mais recentes ainda não lidas
+        self.notified = False     # "stream": já há um aviso pendente na interface
+        self.submitted = time.perf_counter()
+
+
+class EngineWorker:
+    """Executa as buscas do motor em threads separadas.
+
+    Há uma thread por processo do pool, então partidas diferentes buscam em
+    paralelo. Os resultados são entregues por on_result(result), chamado na
+    thread do worker; a interface gráfica o usa para postar um evento do pygame.
+    """
+    def __init__(self, pool, on_result):
+        self.pool = pool
+        self.on_result = on_result
+        self.requests = queue.Queue()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.running = {}  # Pedido em execução -> busca (permite interromper)
+        self.streams = {}  # request_id -> pedido "stream" ativo
+        self.threads = []
+        for i in range(pool.size):
+            thread = threading.Thread(target=self._run, name=f"engine-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, lease, kind, board, limit=None, owner=None, **options):
+        """Enfileira uma busca e devolve o id do pedido"""
+        request = EngineRequest(next(self.ids), kind, lease, board.copy(), limit, owner, options)
+        self.requests.put(request)
+        return request.request_id
+
+    def take_stream(self, request_id):
+        """Linhas mais recentes de uma análise contínua (None se nada mudou)"""
+        with self.lock:
+            request = self.streams.get(request_id)
+            if request is None:
+                return None
+            latest, request.latest = request.latest, None
+            request.notified = False
+            return latest
+
+    def busy(self):
+        """Pedidos em andamento ou na fila (para usar só a capacidade que sobra)"""
+        with self.lock:
+            queued = sum(1 for request in list(self.requests.queue) if request is not None and not request.cancelled)
+            return queued + len(self.running)
+
+    def stop_request(self, request_id):
+        """Encerra a busca de um pedido agora, entregando o melhor lance até aqui"""
+        with self.lock:
+            for request in list(self.requests.queue):
+                if request is not None and request.request_id == request_id:
+                    request.stop_requested = True
+            for request, analysis in self.running.items():
+                if request.request_id == request_id:
+                    request.stop_requested = True
+                    if analysis is not None:
+                        analysis.stop()
+
+    def cancel_request(self, request_id):
+        """Cancela um único pedido (pendente ou em andamento)"""
+        with self.lock:
+            for request in list(self.requests.queue):
+                if request is not None and request.request_id == request_id:
+                    request.cancelled = True
+            for request, analysis in self.running.items():
+                if request.request_id == request_id:
+                    request.cancelled = True
+                    if analysis is not None:
+                        analysis.stop()
+
+    def cancel(self, owner):
+        """Cancela os pedidos pendentes e as buscas em andamento de um dono"""
+        with self.lock:
+            for request in list(self.requests.queue):
+                if request is not None and request.owner is owner:
+                    request.cancelled = True
+            for request, analysis in self.running.items():
+                if request.owner is owner:
+                    request.cancelled = True
+                    if analysis is not None:
+                        analysis.stop()
+
+    def stop(self):
+        """Encerra as threads do worker (interrompe as buscas atuais)"""
+        with self.lock:
+            for request in list(self.requests.queue):
+                if request is not None:
+                    request.cancelled = True
+            for request, analysis in self.running.items():
+                request.cancelled = True
+                if analysis is not None:
+                    analysis.stop()
+        for _ in self.threads:
+            self.requests.put(None)
+        for thread in self.threads:
+            thread.join(timeout=5.0)
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            if request.cancelled:
+                continue
+            with self.lock:
+                self.running[request] = None
+                if request.kind == "stream":
+                    self.streams[request.request_id] = request
+            started = time.perf_counter()
+            try:
+                result = self._execute(request)
+            except Exception as e:
+                result = {"error": str(e)}
+            finally:
+                with self.lock:
+                    del self.running[request]
+                    self.streams.pop(request.request_id, None)
+            if request.cancelled:
+                continue
+            # Tempo na fila e tempo de busca (medição de desempenho)
+            result.update({"request_id": request.request_id, "kind": request.kind,
+                           "owner": request.owner, "board": request.board,
+                           "wait": started - request.submitted, "elapsed": time.perf_counter() - started})
+            self.on_result(result)
+
+    def _execute(self, request):
+        with request.lease.acquire() as engine:
+            # Usar analysis() em vez de play() para poder interromper a busca
+            with engine.analysis(request.board, request.limit, **request.options) as analysis:
+                with self.lock:
+                    self.running[request] = analysis
+                    if request.cancelled or request.stop_requested:
+                        analysis.stop()
+                lines = self._stream(request, analysis) if request.kind == "stream" else None
+                best = analysis.wait()
+                if lines is None and request.options.get("multipv", 1) > 1:
+                    lines = [dict(info) for info in analysis.multipv if "pv" in info]
+                result = {"move": best.move, "ponder": best.ponder, "info": dict(analysis.info)}
+                if lines is not None:
+                    result["lines"] = lines
+                return result
+
+    def _stream(self, request, analysis):
+        """Repassa as linhas da análise conforme melhoram.
+
+        Cada atualização só substitui as linhas guardadas; a interface recebe no
+        máximo um aviso pendente por análise e lê a versão mais recente quando
+        tratar o aviso, então o ritmo de atualização é o dos quadros.
+        """
+        lines = []
+        for _ in analysis:
+            lines = [dict(info) for info in analysis.multipv if "pv" in info]
+            if not lines:
+                continue
+            with self.lock:
+                if request.cancelled:
+                    break
+                request.latest = lines
+                notify = not request.notified
+                request.notified = True
+            if notify:
+                self.on_result({"request_id": request.request_id, "kind": "info",
+                                "owner": request.owner, "board": request.board})
+        return lines
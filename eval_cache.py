@@ -0,0 +1,129 @@
+# eval_cache.py - Cache de avaliações por posição (hash Zobrist), com arquivo em disco
+
+import os
+import struct
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+
+MATE_SCORE = 10000  # Mesmo valor usado pela barra de avaliação
+
+# Formato do arquivo: cabeçalho + registros (hash, pontuação, profundidade, tamanho da PV) + lances
+FILE_MAGIC = b"EVC1"
+RECORD = struct.Struct("<QiBB")
+MOVE = struct.Struct("<H")
+MAX_PV = 255
+
+
+def encode_move(move):
+    """Lance em 16 bits: origem, destino e peça de promoção"""
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(value):
+    promotion = (value >> 12) & 0x7
+    return chess.Move(value & 0x3F, (value >> 6) & 0x3F, promotion=promotion or None)
+
+
+class EvalEntry:
+    """Avaliação guardada: pontuação das brancas em centipeões, profundidade e PV"""
+    __slots__ = ("score", "depth", "pv")
+
+    def __init__(self, score, depth, pv):
+        self.score = score
+        self.depth = depth
+        self.pv = pv
+
+
+class EvalCache:
+    """Cache LRU de avaliações; uma busca mais profunda substitui a mais rasa"""
+    def __init__(self, path=None, capacity=100000):
+        self.path = path
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(board):
+        return chess.polyglot.zobrist_hash(board)
+
+    def get(self, board):
+        key = self.key(board)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, board, info):
+        """Guarda a avaliação de um resultado do motor (info de analyse/analysis)"""
+        if "score" not in info:
+            return None
+        score = info["score"].white().score(mate_score=MATE_SCORE)
+        if score is None:
+            return None
+        depth = min(info.get("depth", 0), 255)
+        pv = info.get("pv", [])[:MAX_PV]
+        key = self.key(board)
+        entry = self.entries.get(key)
+        if entry is not None and entry.depth > depth:
+            # Manter a busca mais profunda
+            self.entries.move_to_end(key)
+            return entry
+        entry = EvalEntry(score, depth, pv)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return entry
+
+    def load(self):
+        """Lê o arquivo do cache; arquivo ausente ou corrompido é ignorado"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            if data[:len(FILE_MAGIC)] != FILE_MAGIC:
+                return 0
+            offset = len(FILE_MAGIC)
+            entries = OrderedDict()
+            while offset + RECORD.size <= len(data):
+                key, score, depth, pv_len = RECORD.unpack_from(data, offset)
+                offset += RECORD.size
+                if offset + pv_len * MOVE.size > len(data):
+                    break
+                pv = [decode_move(MOVE.unpack_from(data, offset + i * MOVE.size)[0]) for i in range(pv_len)]
+                offset += pv_len * MOVE.size
+                entries[key] = EvalEntry(score, depth, pv)
+        except (OSError, struct.error, ValueError) as e:
+            print(f"Erro ao carregar cache de avaliações: {e}")
+            return 0
+        # Entradas em memória (mais recentes) têm prioridade sobre as do arquivo
+        entries.update(self.entries)
+        self.entries = entries
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return len(self.entries)
+
+    def save(self):
+        """Grava o cache (do menos para o mais recente) de forma atômica"""
+        if not self.path:
+            return False
+        parts = [FILE_MAGIC]
+        for key, entry in self.entries.items():
+            parts.append(RECORD.pack(key, entry.score, entry.depth, len(entry.pv)))
+            parts.extend(MOVE.pack(encode_move(move)) for move in entry.pv)
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(parts))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Erro ao salvar cache de avaliações: {e}")
+            return False
+        return True
@@ -0,0 +1,377 @@
+# game_database.py - Banco local de partidas com as posições indexadas por hash Zobrist (SQLite)
+#
+# Uso:
+#   python game_database.py import partidas.pgn [outras.pgn ...] [--db games.db]
+#   python game_database.py query "FEN" [--db games.db] [--games 10]
+#   python game_database.py info [--db games.db]
+#
+# A importação é incremental: cada arquivo guarda até onde já foi lido, então
+# rodar de novo (ou salvar uma partida nova no fim do arquivo) só processa as
+# partidas acrescentadas. As estatísticas por lance ficam agregadas na hora da
+# importação, e a consulta de uma posição é uma busca pela chave primária.
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+from eval_cache import decode_move, encode_move
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATABASE_PATH = os.path.join(SCRIPT_DIR, "games.db")
+BATCH_GAMES = 500  # Partidas por transação (e por ponto de retomada)
+TAIL_BYTES = 64  # Bytes antes do ponto de retomada, para notar um arquivo reescrito
+RESULTS = {"1-0": (1, 0, 0), "1/2-1/2": (0, 1, 0), "0-1": (0, 0, 1)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, offset INTEGER NOT NULL, tail BLOB);
+CREATE TABLE IF NOT EXISTS games (id INTEGER PRIMARY KEY, white TEXT, black TEXT, date TEXT,
+                                  result TEXT, plies INTEGER, file TEXT, offset INTEGER);
+CREATE TABLE IF NOT EXISTS positions (hash INTEGER, game INTEGER, PRIMARY KEY (hash, game)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS moves (hash INTEGER, move INTEGER, games INTEGER, white INTEGER,
+                                  draws INTEGER, black INTEGER, PRIMARY KEY (hash, move)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS saved (record TEXT PRIMARY KEY, game INTEGER NOT NULL, pgn TEXT NOT NULL);
+"""
+
+UPSERT_MOVE = """
+INSERT INTO moves VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (hash, move) DO UPDATE SET
+    games = games + excluded.games, white = white + excluded.white,
+    draws = draws + excluded.draws, black = black + excluded.black
+"""
+
+HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+def signed_key(key):
+    """Hash de 64 bits como inteiro com sinal, o que o SQLite guarda numa coluna INTEGER"""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def position_key(board):
+    return signed_key(chess.polyglot.zobrist_hash(board))
+
+
+def file_tail(path, offset):
+    """Últimos bytes antes de `offset`: iguais na próxima importação se o arquivo só cresceu"""
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - TAIL_BYTES))
+        return f.read(min(offset, TAIL_BYTES))
+
+
+def piece_key(piece_type, color, square):
+    return chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+
+
+class PositionCollector(chess.pgn.BaseVisitor):
+    """Lê uma partida só pela linha principal, guardando cabeçalhos, hashes e lances"""
+    def begin_game(self):
+        self.headers = {}
+        self.keys = []  # Hash de cada posição (a inicial e depois de cada lance)
+        self.moves = []  # Lance jogado a partir de keys[i]
+        # Parte do hash que depende das peças, atualizada só nas casas que o lance muda
+        # (zobrist_hash() percorre o tabuleiro inteiro); None: recalcular tudo
+        self.pieces = None
+        self.failed = False
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def visit_board(self, board):
+        if self.pieces is None:
+            self.pieces = HASHER.hash_board(board)
+        self.keys.append(signed_key(self.pieces ^ HASHER.hash_castling(board) ^
+                                    HASHER.hash_ep_square(board) ^ HASHER.hash_turn(board)))
+
+    def visit_move(self, board, move):
+        self.moves.append(encode_move(move))
+        if not move or board.is_castling(move):
+            self.pieces = None  # Roque (e lance nulo) são raros: hash completo depois do lance
+            return
+        turn = board.turn
+        piece_type = board.piece_type_at(move.from_square)
+        pieces = self.pieces ^ piece_key(piece_type, turn, move.from_square)
+        if board.is_en_passant(move):
+            captured_square = move.to_square - 8 if turn == chess.WHITE else move.to_square + 8
+            pieces ^= piece_key(chess.PAWN, not turn, captured_square)
+        else:
+            captured = board.piece_type_at(move.to_square)
+            if captured:
+                pieces ^= piece_key(captured, not turn, move.to_square)
+        self.pieces = pieces ^ piece_key(move.promotion or piece_type, turn, move.to_square)
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def handle_error(self, error):
+        self.failed = True  # Lance ilegal ou cabeçalho inválido: a partida é ignorada
+
+    def result(self):
+        return self
+
+
+class MoveStats:
+    """Quantas partidas seguiram com um lance e como terminaram"""
+    __slots__ = ("move", "san", "games", "white", "draws", "black")
+
+    def __init__(self, move, san, games, white, draws, black):
+        self.move = move
+        self.san = san
+        self.games = games
+        self.white = white
+        self.draws = draws
+        self.black = black
+
+    def score(self, turn):
+        """Aproveitamento (0 a 100) de quem joga o lance, contando empates como meio ponto"""
+        wins = self.white if turn == chess.WHITE else self.black
+        return 100.0 * (wins + self.draws / 2) / self.games if self.games else 0.0
+
+
+class PositionStats:
+    """Resultado da consulta de uma posição: total de partidas e lances mais jogados"""
+    __slots__ = ("games", "moves", "elapsed")
+
+    def __init__(self, games, moves, elapsed):
+        self.games = games
+        self.moves = moves
+        self.elapsed = elapsed  # Segundos gastos na consulta
+
+
+class GameDatabase:
+    """Banco SQLite de partidas importadas de PGN; aberto na primeira consulta"""
+    def __init__(self, path=DEFAULT_DATABASE_PATH):
+        self.path = path
+        self.db = None
+
+    @property
+    def available(self):
+        return os.path.exists(self.path)
+
+    def open(self, create=False):
+        """Abre o banco (criando as tabelas se `create`); devolve False se não existir"""
+        if self.db is None:
+            if not create and not self.available:
+                return False
+            import sqlite3  # Só quem tem um banco de partidas paga a importação
+            try:
+                self.db = sqlite3.connect(self.path)
+                self.db.execute("PRAGMA journal_mode = WAL")  # Consultas durante uma importação
+                self.db.execute("PRAGMA synchronous = NORMAL")
+                self.db.executescript(SCHEMA)
+            except sqlite3.Error as e:
+                print(f"Erro ao abrir banco de partidas: {e}")
+                self.db = None
+                return False
+        return True
+
+    def import_pgn(self, path, progress=None):
+        """Importa as partidas de um arquivo que ainda não foram lidas; devolve quantas"""
+        if not self.open(create=True):
+            return 0
+        path = os.path.abspath(path)
+        row = self.db.execute("SELECT offset, tail FROM files WHERE path = ?", (path,)).fetchone()
+        offset = row[0] if row else 0
+        if offset and (offset > os.path.getsize(path) or file_tail(path, offset) != row[1]):
+            # As partidas antigas já estão somadas nas estatísticas: só dá para reimportar do zero
+            print(f"{path} foi reescrito desde a última importação; apague {self.path} para reimportar",
+                  file=sys.stderr)
+            return 0
+        imported = 0
+        with open(path, encoding="utf-8-sig", errors="replace") as handle:
+            handle.seek(offset)
+            while True:
+                count, offset = self.import_batch(handle, path, offset)
+                imported += count
+                if progress is not None:
+                    progress(imported)
+                if count < BATCH_GAMES:
+                    return imported
+
+    def import_batch(self, handle, path, offset):
+        """Importa até BATCH_GAMES partidas numa transação; devolve (partidas, offset seguinte)"""
+        stats = {}  # (hash, lance) -> [partidas, brancas, empates, pretas]
+        positions = []
+        count = 0
+        with self.db:
+            while count < BATCH_GAMES:
+                start = offset
+                collector = chess.pgn.read_game(handle, Visitor=PositionCollector)
+                if collector is None:
+                    break
+                offset = handle.tell()
+                if collector.failed or not collector.moves:
+                    continue
+                game_id = self.insert_game(collector, path, start)
+                count_moves(stats, collector)
+                positions.extend((key, game_id) for key in set(collector.keys))
+                count += 1
+            self.db.executemany("INSERT OR IGNORE INTO positions VALUES (?, ?)", positions)
+            self.db.executemany(UPSERT_MOVE, [(key, move, *entry) for (key, move), entry in stats.items()])
+            # O ponto de retomada é gravado na mesma transação que as partidas
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, offset, file_tail(path, offset)))
+        return count, offset
+
+    def insert_game(self, collector, path, offset):
+        """Linha da partida na tabela games; devolve o id"""
+        headers = collector.headers
+        return self.db.execute(
+            "INSERT INTO games (white, black, date, result, plies, file, offset) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (headers.get("White", "?"), headers.get("Black", "?"), headers.get("Date", "????.??.??"),
+             headers.get("Result", "*"), len(collector.moves), path, offset)).lastrowid
+
+    def add_game(self, game, record, path=None):
+        """Indexa uma partida em memória (chess.pgn.Game); `record` identifica a partida
+
+        Salvar de novo a mesma partida substitui a versão anterior no banco, em vez
+        de contá-la duas vezes. Devolve True se a partida entrou no banco.
+        """
+        if not self.open(create=True):
+            return False
+        collector = game.accept(PositionCollector())
+        pgn = game.accept(chess.pgn.StringExporter(variations=False, comments=False))
+        with self.db:
+            row = self.db.execute("SELECT game, pgn FROM saved WHERE record = ?", (record,)).fetchone()
+            if row is not None:
+                if row[1] == pgn:
+                    return True  # Nada mudou desde o último salvamento
+                # Tira a versão anterior das estatísticas (guardada como PGN só da linha principal)
+                old_id, old_pgn = row
+                old = chess.pgn.read_game(io.StringIO(old_pgn), Visitor=PositionCollector)
+                stats = {}
+                count_moves(stats, old, -1)
+                self.db.executemany(UPSERT_MOVE, [(key, move, *entry) for (key, move), entry in stats.items()])
+                self.db.executemany("DELETE FROM moves WHERE hash = ? AND move = ? AND games <= 0", list(stats))
+                self.db.executemany("DELETE FROM positions WHERE hash = ? AND game = ?",
+                                    [(key, old_id) for key in set(old.keys)])
+                self.db.execute("DELETE FROM games WHERE id = ?", (old_id,))
+                self.db.execute("DELETE FROM saved WHERE record = ?", (record,))
+            if collector.failed or not collector.moves:
+                return False
+            game_id = self.insert_game(collector, path and os.path.abspath(path), None)
+            stats = {}
+            count_moves(stats, collector)
+            self.db.executemany("INSERT OR IGNORE INTO positions VALUES (?, ?)",
+                                [(key, game_id) for key in set(collector.keys)])
+            self.db.executemany(UPSERT_MOVE, [(key, move, *entry) for (key, move), entry in stats.items()])
+            self.db.execute("INSERT INTO saved VALUES (?, ?, ?)", (record, game_id, pgn))
+        return True
+
+    def lookup(self, board, limit=5):
+        """Lances mais jogados a partir da posição (None sem banco; poucos ms com milhões de posições)"""
+        if not self.open():
+            return None
+        start = time.perf_counter()
+        rows = self.db.execute("SELECT move, games, white, draws, black FROM moves WHERE hash = ? "
+                               "ORDER BY games DESC", (position_key(board),)).fetchall()
+        moves = []
+        for value, games, white, draws, black in rows[:limit]:
+            move = decode_move(value)
+            try:
+                san = board.san(move)
+            except ValueError:
+                continue  # Colisão de hash: o lance não vale nesta posição
+            moves.append(MoveStats(move, san, games, white, draws, black))
+        total = sum(row[1] for row in rows)
+        return PositionStats(total, moves, time.perf_counter() - start)
+
+    def games_with(self, board, limit=10):
+        """Partidas mais recentes (última importada primeiro) que passaram pela posição"""
+        if not self.open():
+            return []
+        return self.db.execute(
+            "SELECT g.white, g.black, g.date, g.result, g.plies, g.file FROM positions p "
+            "JOIN games g ON g.id = p.game WHERE p.hash = ? ORDER BY p.game DESC LIMIT ?",
+            (position_key(board), limit)).fetchall()
+
+    def info(self):
+        """Contagens do banco: (partidas, posições por partida, lances distintos por posição)"""
+        if not self.open():
+            return None
+        return tuple(self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                     for table in ("games", "positions", "moves"))
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def count_moves(stats, collector, sign=1):
+    """Soma (ou, com sign=-1, subtrai) os lances de uma partida em stats"""
+    white, draws, black = RESULTS.get(collector.headers.get("Result", "*"), (0, 0, 0))
+    # Cada partida conta uma vez por posição (e por lance), mesmo com repetições
+    for key_move in set(zip(collector.keys, collector.moves)):
+        entry = stats.get(key_move)
+        if entry is None:
+            stats[key_move] = [sign, sign * white, sign * draws, sign * black]
+        else:
+            entry[0] += sign
+            entry[1] += sign * white
+            entry[2] += sign * draws
+            entry[3] += sign * black
+
+
+def run_import(database, paths):
+    start = time.perf_counter()
+    total = 0
+    for path in paths:
+        def progress(count):
+            elapsed = max(time.perf_counter() - start, 1e-9)
+            print(f"{path}: {count} partidas ({(total + count) / elapsed:.1f} partidas/s)", file=sys.stderr)
+        try:
+            total += database.import_pgn(path, progress)
+        except OSError as e:
+            print(f"Erro ao importar {path}: {e}", file=sys.stderr)
+    print(f"{total} partidas novas em {time.perf_counter() - start:.1f} s")
+
+
+def run_query(database, fen, games):
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        sys.exit(f"FEN inválida: {e}")
+    stats = database.lookup(board, limit=20)
+    if stats is None:
+        sys.exit(f"Banco não encontrado: {database.path}")
+    print(f"{stats.games} partidas ({stats.elapsed * 1000:.2f} ms)")
+    for entry in stats.moves:
+        print(f"  {entry.san:<8} {entry.games:>8}  {entry.score(board.turn):5.1f}%  "
+              f"+{entry.white} ={entry.draws} -{entry.black}")
+    for white, black, date, result, plies, path in database.games_with(board, games):
+        print(f"  {date}  {white} x {black}  {result}  ({plies} meias-jogadas, {os.path.basename(path)})")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Banco local de partidas indexado por posição")
+    parser.add_argument("--db", default=DEFAULT_DATABASE_PATH, help="Arquivo do banco SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Importar (ou continuar importando) arquivos PGN")
+    import_parser.add_argument("paths", nargs="+", help="Arquivos PGN")
+    query_parser = commands.add_parser("query", help="Lances e partidas de uma posição")
+    query_parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    query_parser.add_argument("--games", type=int, default=10, help="Partidas listadas")
+    commands.add_parser("info", help="Tamanho do banco")
+    args = parser.parse_args()
+
+    database = GameDatabase(args.db)
+    try:
+        if args.command == "import":
+            run_import(database, args.paths)
+        elif args.command == "query":
+            run_query(database, args.fen, args.games)
+        else:
+            counts = database.info()
+            if counts is None:
+                sys.exit(f"Banco não encontrado: {database.path}")
+            print("{} partidas, {} posições (por partida), {} pares posição/lance".format(*counts))
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main_cli()
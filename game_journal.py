@@ -0,0 +1,161 @@
+# game_journal.py - Diário da partida em andamento (só acréscimos), para retomar após falhas
+#
+# Formato (uma linha por registro; uma linha final cortada por queda é ignorada):
+#   H {"player_color": "white", "difficulty": 10, "time_control": [180, 2], "fen": "...", "record": "...",
+#      "started": ...}
+#   M e2e4 1532 35 178.4 180.0    lance UCI, ms desde o início, avaliação (cp), relógios (ou -)
+#   S 12                          posição atual passou a ser a meia-jogada 12 (voltar/avançar)
+#   R 1-0                         partida encerrada (não é oferecida para retomar)
+
+import json
+import os
+import queue
+import threading
+import time
+
+FSYNC_INTERVAL = 1.0  # Segundos máximos entre fsyncs (perda máxima numa queda de energia)
+
+
+class JournalRecord:
+    """Um lance lido do diário"""
+    __slots__ = ("uci", "ms", "eval", "clocks")
+
+    def __init__(self, uci, ms, eval_cp, clocks):
+        self.uci = uci
+        self.ms = ms
+        self.eval = eval_cp
+        self.clocks = clocks  # (brancas, pretas) em segundos, ou None sem relógio
+
+
+class GameJournal:
+    """Grava o diário numa thread própria: registrar um lance só enfileira uma linha"""
+    def __init__(self, path):
+        self.path = path
+        self.lines = queue.Queue()
+        self.started = time.time()
+        self.thread = None
+
+    def start(self, header, moves=()):
+        """Começa um diário novo (apaga o anterior) com o cabeçalho e os lances já jogados"""
+        self.started = header.setdefault("started", time.time())
+        self.lines.put(("open", None))
+        self.lines.put(("line", "H " + json.dumps(header, ensure_ascii=False)))
+        for move in moves:
+            self.record(move)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="game-journal", daemon=True)
+            self.thread.start()
+
+    def resume(self, started, size):
+        """Continua um diário existente, descartando o que vier depois de `size` bytes válidos"""
+        self.started = started
+        self.lines.put(("append", size))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="game-journal", daemon=True)
+            self.thread.start()
+
+    def record(self, move, eval_cp=None, clocks=None):
+        ms = int((time.time() - self.started) * 1000)
+        value = "-" if eval_cp is None else str(int(eval_cp))
+        if clocks is None:
+            times = "- -"
+        else:
+            times = f"{clocks[0]:.1f} {clocks[1]:.1f}"
+        self.lines.put(("line", f"M {move.uci()} {ms} {value} {times}"))
+
+    def seek(self, ply):
+        """Registra que a posição atual é a da meia-jogada `ply` da linha (navegação)"""
+        self.lines.put(("line", f"S {ply}"))
+
+    def finish(self, result):
+        """Marca a partida como encerrada"""
+        self.lines.put(("line", f"R {result}"))
+        self.lines.put(("sync", None))
+
+    def close(self):
+        """Grava o que falta e encerra a thread"""
+        if self.thread is not None:
+            self.lines.put(("close", None))
+            self.thread.join(timeout=5.0)
+            self.thread = None
+
+    def _run(self):
+        f = None
+        last_sync = time.monotonic()
+        dirty = False
+        while True:
+            # Esperar no máximo até o próximo fsync pendente
+            timeout = max(0.0, FSYNC_INTERVAL - (time.monotonic() - last_sync)) if dirty else None
+            try:
+                op, text = self.lines.get(timeout=timeout)
+            except queue.Empty:
+                op, text = "sync", None
+            try:
+                if op == "open":
+                    if f is not None:
+                        f.close()
+                    f = open(self.path, "w", encoding="utf-8")
+                elif op == "append":
+                    if f is not None:
+                        f.close()
+                    f = open(self.path, "r+", encoding="utf-8")
+                    f.truncate(text)  # Linha cortada por uma queda
+                    f.seek(0, os.SEEK_END)
+                elif op == "line" and f is not None:
+                    f.write(text + "\n")
+                    dirty = True
+                    if not self.lines.empty():
+                        continue  # Juntar as linhas já enfileiradas numa só gravação
+                    # Depois do flush o lance sobrevive à queda do processo; o fsync
+                    # (no máximo a cada FSYNC_INTERVAL) protege contra queda do sistema
+                    f.flush()
+                if f is not None and dirty and (op in ("sync", "close") or
+                                                time.monotonic() - last_sync >= FSYNC_INTERVAL):
+                    f.flush()
+                    os.fsync(f.fileno())
+                    last_sync = time.monotonic()
+                    dirty = False
+            except OSError as e:
+                print(f"Erro ao gravar diário da partida: {e}")
+            if op == "close":
+                if f is not None:
+                    f.close()
+                return
+
+    @staticmethod
+    def read(path):
+        """Lê um diário: (cabeçalho, lances da linha, resultado ou None, bytes válidos, meia-jogada atual)"""
+        try:
+            with open(path, "rb") as f:
+                content = f.read().decode("utf-8", errors="replace")
+        except OSError:
+            return None
+        lines = content.split("\n")[:-1]  # O que vem depois do último \n foi cortado no meio
+        header, records, result, size, ply = None, [], None, 0, 0
+        for line in lines:
+            kind, _, rest = line.partition(" ")
+            try:
+                if kind == "H" and header is None:
+                    header = json.loads(rest)
+                elif kind == "M" and header is not None:
+                    uci, ms, value, white, black = rest.split()
+                    clocks = None if white == "-" else (float(white), float(black))
+                    record = JournalRecord(uci, int(ms), None if value == "-" else int(value), clocks)
+                    if ply < len(records) and records[ply].uci == uci:
+                        records[ply] = record  # Refez um lance da linha: o resto dela continua valendo
+                    else:
+                        del records[ply:]  # Lance novo depois de voltar: a linha ramifica
+                        records.append(record)
+                    ply += 1
+                elif kind == "S" and header is not None:
+                    ply = min(int(rest), len(records))
+                elif kind == "R":
+                    result = rest
+                else:
+                    break
+            except ValueError:
+                break
+            size += len(line.encode("utf-8")) + 1
+        if header is None:
+            return None
+        return header, records, result, size, ply
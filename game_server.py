@@ -0,0 +1,399 @@
+# game_server.py - Servidor asyncio com muitas partidas simultâneas (sem interface gráfica)
+#
+# Uso:
+#   python game_server.py serve [--port 8765] [--engines 4] [--engine interno]
+#   python game_server.py load --sessions 200 --moves 20 [--spawn --engine interno]
+#   python game_server.py load --sessions 512 --target-p99 500 [--spawn]   (mede a capacidade)
+#
+# Protocolo: uma mensagem JSON por linha, nos dois sentidos.
+#   {"op": "new", "color": "white", "level": 5, "time_control": [180, 2]}
+#       -> {"op": "started", "game": 1, "fen": ..., "bot_move": null}
+#   {"op": "move", "game": 1, "uci": "e2e4"}
+#       -> {"op": "moved", "game": 1, "san": "e4", "bot_move": "e7e5", "bot_san": "e5", "fen": ...,
+#           "game_over": false, "message": ""}
+#   {"op": "pgn", "game": 1} -> {"op": "pgn", "game": 1, "pgn": ...}
+#   {"op": "close", "game": 1} -> {"op": "closed", "game": 1}
+#   Erros: {"op": "error", "game": 1, "error": "..."}; "busy" quando o servidor está cheio.
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.engine
+
+from chess_core import GameCore
+from engine_pool import EnginePool
+from time_control import engine_limit, level_nodes
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENGINE_PATH = os.path.join(SCRIPT_DIR, "engines", "stockfish.exe")
+DEFAULT_PORT = 8765
+MAX_SESSIONS = 1000  # Partidas abertas no servidor
+MAX_PENDING = 256  # Buscas na fila do motor; acima disso novos lances recebem "busy"
+MAX_LINE = 64 * 1024  # Tamanho máximo de uma mensagem
+
+
+class EngineScheduler:
+    """Divide o tempo do motor entre as sessões (quem usou menos é atendido primeiro)
+
+    Cada sessão tem no máximo uma busca na fila; a fila inteira é limitada por
+    MAX_PENDING, e o excesso é recusado em vez de acumular latência.
+    """
+    def __init__(self, pool, max_pending=MAX_PENDING):
+        self.pool = pool
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="engine")
+        self.waiting = []  # heap (tempo de motor usado pela sessão, ordem, futuro)
+        self.order = itertools.count()
+        self.free = pool.size
+        self.nodes = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def pending(self):
+        return len(self.waiting)
+
+    def full(self):
+        return len(self.waiting) >= self.max_pending
+
+    async def play(self, session, board, limit):
+        """Busca a jogada quando chegar a vez da sessão; devolve o PlayResult"""
+        loop = asyncio.get_running_loop()
+        if self.free > 0 and not self.waiting:
+            self.free -= 1
+        else:
+            turn = loop.create_future()
+            heapq.heappush(self.waiting, (session.engine_time, next(self.order), turn))
+            try:
+                await turn  # O dono da vaga a passa diretamente para esta busca
+            except asyncio.CancelledError:
+                # Cancelada depois de receber a vaga (ex.: cliente desconectou): devolvê-la
+                if turn.done() and not turn.cancelled():
+                    self._release()
+                raise
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self.executor, self._play, session.lease, board, limit)
+            self.nodes += result.info.get("nodes", 0)  # No laço de eventos: sem corrida entre threads
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            session.engine_time += elapsed
+            self.busy_seconds += elapsed
+            self._release()
+
+    def _play(self, lease, board, limit):
+        return lease.play(board, limit, info=chess.engine.INFO_BASIC)
+
+    def _release(self):
+        while self.waiting:
+            _, _, turn = heapq.heappop(self.waiting)
+            if not turn.done():  # Sessões que fecharam desistem da vez
+                turn.set_result(None)
+                return
+        self.free += 1
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Session:
+    """Uma partida no servidor: regras do GameCore e a concessão de motor dela"""
+    def __init__(self, game_id, core, lease, level):
+        self.game_id = game_id
+        self.core = core
+        self.lease = lease
+        self.level = level
+        self.engine_time = 0.0
+        self.lock = asyncio.Lock()  # Um lance de cada vez por partida
+
+    def limit(self):
+        if self.core.clock is not None:
+            return engine_limit(self.core.board, self.level, self.core.clock)
+        return chess.engine.Limit(nodes=level_nodes(self.level))
+
+    def state(self):
+        return {"fen": self.core.board.fen(), "game_over": self.core.game_over, "message": self.core.message}
+
+
+class GameServer:
+    """Partidas de vários clientes compartilhando um pool de motores"""
+    def __init__(self, pool, max_sessions=MAX_SESSIONS):
+        self.pool = pool
+        self.scheduler = EngineScheduler(pool)
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.moves = 0
+
+    async def bot_move(self, session):
+        """Jogada do motor, se for a vez dele; devolve (uci, san) ou (None, None)"""
+        core = session.core
+        if core.game_over or core.board.turn == core.player_color:
+            return None, None
+        result = await self.scheduler.play(session, core.board.copy(), session.limit())
+        if core.check_clock() or result.move is None:
+            return None, None
+        san = core.execute_move(result.move)
+        return result.move.uci(), san
+
+    async def handle(self, message, owned):
+        op = message.get("op")
+        game_id = message.get("game")
+        if op == "new":
+            if len(self.sessions) >= self.max_sessions:
+                return {"op": "error", "error": "busy"}
+            color = chess.BLACK if message.get("color") == "black" else chess.WHITE
+            if color == chess.BLACK and self.scheduler.full():
+                # O motor abre a partida: mesma contrapressão dos lances
+                return {"op": "error", "error": "busy"}
+            level = max(0, min(20, int(message.get("level", 10))))
+            time_control = message.get("time_control")
+            core = GameCore(color, level, time_control=tuple(time_control) if time_control else None)
+            session = Session(next(self.ids), core, self.pool.lease({"Skill Level": level}), level)
+            self.sessions[session.game_id] = session
+            owned.add(session.game_id)
+            async with session.lock:
+                bot_uci, _ = await self.bot_move(session)
+            return {"op": "started", "game": session.game_id, "bot_move": bot_uci, **session.state()}
+
+        session = self.sessions.get(game_id) if game_id in owned else None
+        if session is None:
+            return {"op": "error", "game": game_id, "error": "partida inexistente"}
+
+        if op == "move":
+            if session.lock.locked():
+                return {"op": "error", "game": game_id, "error": "lance anterior em andamento"}
+            async with session.lock:
+                core = session.core
+                if core.game_over or core.board.turn != core.player_color:
+                    return {"op": "error", "game": game_id, "error": "não é a sua vez"}
+                try:
+                    move = chess.Move.from_uci(message.get("uci", ""))
+                except ValueError:
+                    move = None
+                if move is None or not core.board.is_legal(move):
+                    return {"op": "error", "game": game_id, "error": "lance ilegal"}
+                if self.scheduler.full():
+                    # Contrapressão: recusar antes de mudar a partida
+                    return {"op": "error", "game": game_id, "error": "busy"}
+                if core.check_clock():
+                    return {"op": "moved", "game": game_id, "san": None, "bot_move": None, **session.state()}
+                san = core.execute_move(move)
+                bot_uci, bot_san = await self.bot_move(session)
+                self.moves += 1
+                return {"op": "moved", "game": game_id, "san": san, "bot_move": bot_uci, "bot_san": bot_san,
+                        **session.state()}
+
+        if op == "pgn":
+            return {"op": "pgn", "game": game_id, "pgn": str(session.core.to_pgn())}
+
+        if op == "close":
+            self.close_session(game_id, owned)
+            return {"op": "closed", "game": game_id}
+
+        return {"op": "error", "game": game_id, "error": f"operação desconhecida: {op}"}
+
+    def close_session(self, game_id, owned):
+        owned.discard(game_id)
+        self.sessions.pop(game_id, None)
+
+    async def client(self, reader, writer):
+        """Uma conexão: várias partidas, respostas na ordem em que ficam prontas"""
+        owned = set()
+        tasks = set()
+        write_lock = asyncio.Lock()
+
+        async def respond(message):
+            try:
+                reply = await self.handle(message, owned)
+            except Exception as e:
+                reply = {"op": "error", "game": message.get("game"), "error": str(e)}
+            if "id" in message:
+                reply["id"] = message["id"]
+            async with write_lock:
+                writer.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()  # Cliente lento segura só a própria conexão
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    continue
+                task = asyncio.create_task(respond(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            for game_id in list(owned):
+                self.close_session(game_id, owned)
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.client, host, port, limit=MAX_LINE)
+        print(f"Servidor em {host}:{port} ({self.pool.size} motores)", file=sys.stderr)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+
+# --- Gerador de carga ---
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def load_session(host, port, args, latencies, rng):
+    """Um cliente: abre uma partida e joga lances aleatórios medindo o tempo de ida e volta"""
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+
+    async def request(message):
+        writer.write((json.dumps(message) + "\n").encode("utf-8"))
+        await writer.drain()
+        return json.loads(await reader.readline())
+
+    errors = 0
+    try:
+        reply = await request({"op": "new", "color": "white", "level": args.level})
+        if reply["op"] != "started":
+            return 1
+        game_id = reply["game"]
+        board = chess.Board(reply["fen"])
+        for _ in range(args.moves):
+            if board.is_game_over():
+                break
+            move = rng.choice(list(board.legal_moves))
+            start = time.perf_counter()
+            reply = await request({"op": "move", "game": game_id, "uci": move.uci()})
+            if reply["op"] != "moved":
+                errors += 1
+                if reply.get("error") == "busy":
+                    await asyncio.sleep(0.1)
+                    continue
+                break
+            latencies.append(time.perf_counter() - start)
+            board = chess.Board(reply["fen"])
+            if reply["game_over"]:
+                break
+        await request({"op": "close", "game": game_id})
+    finally:
+        writer.close()
+    return errors
+
+
+async def load_round(args, sessions):
+    """Uma rodada de carga com `sessions` clientes; devolve (latências, segundos, erros)"""
+    latencies = []
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(load_session(args.host, args.port, args, latencies, random.Random(rng.random()))
+                                     for _ in range(sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    return latencies, elapsed, sum(r if isinstance(r, int) else 1 for r in results)
+
+
+async def run_load(args):
+    server_task = None
+    if args.spawn:
+        pool = EnginePool(None if args.engine == "interno" else args.engine, args.engines)
+        pool.start()
+        server = GameServer(pool)
+        ready = asyncio.Event()
+        server_task = asyncio.create_task(server.serve(args.host, args.port, ready))
+        await ready.wait()
+
+    cores = os.cpu_count() or 1
+    if args.target_p99:
+        # Dobrar o número de clientes até a latência p99 passar do alvo: a capacidade medida
+        # é a maior carga que ainda cumpriu o alvo
+        capacity = 0
+        sessions = 1
+        while sessions <= args.sessions:
+            latencies, elapsed, errors = await load_round(args, sessions)
+            p99 = percentile(latencies, 0.99) * 1000
+            print(f"{sessions:5d} sessões: p99 {p99:.0f} ms, {len(latencies) / elapsed:.1f} lances/s, {errors} erros")
+            if errors or p99 > args.target_p99:
+                break
+            capacity = sessions
+            sessions *= 2
+        limited = " (limite de --sessions: pode caber mais)" if sessions > args.sessions else ""
+        print(f"\nCapacidade medida: {capacity} sessões com p99 <= {args.target_p99:.0f} ms "
+              f"({capacity / cores:.1f} sessões/núcleo, {cores} núcleos){limited}")
+    else:
+        latencies, elapsed, errors = await load_round(args, args.sessions)
+        # Razão da carga configurada, não capacidade (para medir, use --target-p99)
+        print(f"\n{args.sessions} sessões simultâneas, {cores} núcleos "
+              f"(carga configurada: {args.sessions / cores:.1f} sessões/núcleo)")
+        print(f"{len(latencies)} lances em {elapsed:.1f} s ({len(latencies) / elapsed:.1f} lances/s), {errors} erros")
+        print(f"Ida e volta do lance: p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms, máx {max(latencies, default=0) * 1000:.0f} ms")
+    if server_task is not None:
+        scheduler = server.scheduler
+        if scheduler.busy_seconds > 0:
+            print(f"Motor: {scheduler.nodes / scheduler.busy_seconds:.0f} nós/s por busca")
+        server_task.cancel()
+        scheduler.close()
+        pool.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Servidor de partidas e gerador de carga")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("serve", "load"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=DEFAULT_PORT)
+        p.add_argument("--engine", default=DEFAULT_ENGINE_PATH, help="Executável UCI ('interno' para o motor em Python)")
+        p.add_argument("--engines", type=int, default=os.cpu_count() or 2, help="Processos do motor compartilhados")
+        if name == "serve":
+            p.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+        else:
+            p.add_argument("--sessions", type=int, default=50, help="Clientes simultâneos (máximo com --target-p99)")
+            p.add_argument("--target-p99", type=float, default=0,
+                           help="Medir a capacidade: mais sessões com p99 do lance abaixo deste valor (ms)")
+            p.add_argument("--moves", type=int, default=20, help="Lances por cliente")
+            p.add_argument("--level", type=int, default=0, help="Nível do motor nas partidas")
+            p.add_argument("--seed", type=int, default=1)
+            p.add_argument("--spawn", action="store_true", help="Iniciar o servidor neste processo")
+    args = parser.parse_args()
+    args.engines = max(1, args.engines)
+
+    if args.command == "serve":
+        pool = EnginePool(None if args.engine == "interno" else args.engine, args.engines)
+        pool.start()
+        server = GameServer(pool, args.max_sessions)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.scheduler.close()
+            pool.close()
+    else:
+        asyncio.run(run_load(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -7,13 +7,20 @@ import chess.pgn
 import os
 import sys
 import time
-from datetime import datetime
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import io
 
-# Inicializar Pygame
-pygame.init()
+from chess_core import GameCore, PROMOTION_PIECES
+from engine_pool import EnginePool
+from eval_cache import EvalCache
+from opening_book import OpeningBook
+from engine_worker import EngineWorker
+from game_database import GameDatabase
+from game_journal import GameJournal
+from metrics import MetricsRecorder
+from tablebase import Tablebase
+from time_control import TIME_CONTROLS, ChessClock, engine_limit, forced_move, level_nodes, move_time
 
 # Configurações da tela
 TILE_SIZE = 80
@@ -22,8 +29,9 @@ BOARD_HEIGHT = TILE_SIZE * 8
 UI_HEIGHT = 250
 WIDTH = BOARD_WIDTH + 250  # +250 para o painel lateral
 HEIGHT = max(BOARD_HEIGHT, 600) + UI_HEIGHT
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Jogo de Xadrez Profissional")
+HISTORY_ROWS = 8  # Jogadas visíveis no histórico
+HISTORY_NAV = (("|<", "first"), ("<", "back"), (">", "forward"), (">|", "last"))
+HISTORY_KEYS = {pygame.K_HOME: "first", pygame.K_LEFT: "back", pygame.K_RIGHT: "forward", pygame.K_END: "last"}
 
 # Cores
 LIGHT_SQUARE = (240, 217, 181)
@@ -32,6 +40,7 @@ SELECTED_COLOR = (100, 100, 255, 150)  # Azul claro transparente
 HIGHLIGHT_COLOR = (124, 252, 0, 180)   # Verde claro transparente para movimentos válidos
 LAST_MOVE_COLOR = (155, 199, 0, 150)   # Amarelo-esverdeado para último movimento
 CHECK_COLOR = (255, 0, 0, 150)         # Vermelho para xeque
+SUGGESTION_COLOR = (255, 140, 0, 140)  # Laranja para o lance sugerido
 TEXT_COLOR = (255, 255, 255)
 TEXT_COLOR_HIGHLIGHT = (255, 215, 0)  # Dourado
 BACKGROUND_COLOR = (30, 30, 40)
@@ -45,63 +54,273 @@ EVAL_BAR_BG = (60, 60, 70)
 EVAL_BAR_WHITE = (240, 240, 240)
 EVAL_BAR_BLACK = (30, 30, 30)
 
-# Fontes
-font_title = pygame.font.SysFont("Arial", 36, bold=True)
-font_large = pygame.font.SysFont("Arial", 28)
-font_medium = pygame.font.SysFont("Arial", 24)
-font_small = pygame.font.SysFont("Arial", 20)
-font_tiny = pygame.font.SysFont("Arial", 16)
+# Tela, fontes e imagens: criadas por init_display() (nada acontece ao importar)
+screen = None
+font_title = font_large = font_medium = font_small = font_tiny = None
 
 # --- Carregamento de Imagens das Peças ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(SCRIPT_DIR, "assets", "pieces")
 
-# Carregar imagens das peças
 PIECE_IMAGES = {}
 pieces_list = ['w_pawn', 'w_rook', 'w_knight', 'w_bishop', 'w_queen', 'w_king',
                'b_pawn', 'b_rook', 'b_knight', 'b_bishop', 'b_queen', 'b_king']
 
-for piece in pieces_list:
-    image_path = os.path.join(ASSETS_DIR, f'{piece}.png')
-    try:
-        # Carregar imagem com anti-aliasing
-        image = pygame.image.load(image_path).convert_alpha()
-        PIECE_IMAGES[piece] = image
-    except Exception as e:
-        print(f"Erro ao carregar {piece}: {e}")
+def load_piece_images():
+    """Carrega as imagens das peças (exige a tela já criada)"""
+    for piece in pieces_list:
+        image_path = os.path.join(ASSETS_DIR, f'{piece}.png')
+        try:
+            # Carregar imagem com anti-aliasing
+            image = pygame.image.load(image_path).convert_alpha()
+            PIECE_IMAGES[piece] = image
+        except Exception as e:
+            print(f"Erro ao carregar {piece}: {e}")
+
+def piece_image_name(piece):
+    """Nome da imagem de uma peça (ex.: 'w_knight')"""
+    return f"{'w' if piece.color == chess.WHITE else 'b'}_{chess.piece_name(piece.piece_type)}"
+
+class SpriteCache:
+    """Sprites das peças já redimensionados, por peça e tamanho"""
+    def __init__(self, images, theme="padrao"):
+        self.images = images
+        self.theme = theme
+        self.sprites = {}
+
+    def set_theme(self, images, theme):
+        """Troca o conjunto de imagens e descarta os sprites já gerados"""
+        self.images = images
+        self.theme = theme
+        self.sprites.clear()
+
+    def get(self, piece_name, size):
+        key = (piece_name, size)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            image = self.images.get(piece_name)
+            if image is None:
+                return None
+            # Redimensionar apenas uma vez por peça e tamanho
+            sprite = pygame.transform.smoothscale(image, (size, size))
+            self.sprites[key] = sprite
+        return sprite
+
+sprite_cache = SpriteCache(PIECE_IMAGES)
+
+class BoardLayer:
+    """Superfícies do tabuleiro criadas uma única vez: fundo xadrezado e destaques"""
+    def __init__(self, tile_size):
+        self.tile_size = tile_size
+        self.rects = [pygame.Rect(chess.square_file(square) * tile_size,
+                                  (7 - chess.square_rank(square)) * tile_size,
+                                  tile_size, tile_size) for square in chess.SQUARES]
+        self.background = None
+        self.overlays = {}
+        self.move_dot = None
+
+    def get_background(self):
+        """Tabuleiro vazio pré-renderizado"""
+        if self.background is None:
+            self.background = pygame.Surface((self.tile_size * 8, self.tile_size * 8))
+            for square, rect in enumerate(self.rects):
+                color = LIGHT_SQUARE if (chess.square_file(square) + chess.square_rank(square)) % 2 == 1 else DARK_SQUARE
+                pygame.draw.rect(self.background, color, rect)
+        return self.background
+
+    def overlay(self, color):
+        """Destaque translúcido do tamanho de uma casa (um por cor)"""
+        surface = self.overlays.get(color)
+        if surface is None:
+            surface = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+            surface.fill(color)
+            self.overlays[color] = surface
+        return surface
+
+    def get_move_dot(self):
+        """Círculo de movimento válido, centralizado numa casa transparente"""
+        if self.move_dot is None:
+            self.move_dot = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+            center = self.tile_size // 2
+            radius = 6  # Reduzido de 8 para 6
+            # Cores opacas: na tela o alfa destes círculos nunca foi aplicado
+            # Sombra
+            pygame.draw.circle(self.move_dot, (0, 0, 0), (center + 1, center + 1), radius)
+            # Círculo principal
+            pygame.draw.circle(self.move_dot, HIGHLIGHT_COLOR[:3], (center, center), radius)
+            pygame.draw.circle(self.move_dot, (255, 255, 255), (center, center), radius, 1)
+        return self.move_dot
+
+    def draw_square_background(self, screen, square):
+        rect = self.rects[square]
+        screen.blit(self.get_background(), rect, rect)
+        return rect
+
+board_layer = BoardLayer(TILE_SIZE)
+
+class TextCache:
+    """Textos já renderizados, por fonte, texto e cor (LRU de tamanho limitado)"""
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+text_cache = TextCache()
+
+def init_display():
+    """Inicializa o pygame, a janela, as fontes e as imagens das peças"""
+    global screen, font_title, font_large, font_medium, font_small, font_tiny
+    if screen is not None:
+        return screen
+
+    # Inicializar Pygame
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Jogo de Xadrez Profissional")
+
+    # Fontes
+    font_title = pygame.font.SysFont("Arial", 36, bold=True)
+    font_large = pygame.font.SysFont("Arial", 28)
+    font_medium = pygame.font.SysFont("Arial", 24)
+    font_small = pygame.font.SysFont("Arial", 20)
+    font_tiny = pygame.font.SysFont("Arial", 16)
+    text_cache.clear()
+
+    load_piece_images()
+    sprite_cache.set_theme(PIECE_IMAGES, sprite_cache.theme)
+    return screen
 
 # --- Configuração do Stockfish ---
 ENGINE_PATH = os.path.join(SCRIPT_DIR, "engines", "stockfish.exe")
+ENGINE_POOL_SIZE = 2  # Processos do Stockfish (jogada do bot e sugestão em paralelo)
+ANALYSIS_MULTIPV = 3  # Linhas mostradas no modo de análise
+QUICK_MOVE_DELAY = 0.3  # Espera antes de lances do livro e lances únicos (sem o motor)
+PONDER_MIN_LEVEL = 10  # Nível a partir do qual o bot pensa no tempo do jogador
+PONDER_MAX_TIME = 60.0  # Limite da busca de ponder (jogador ausente)
+HINT_TIME = 2.0  # Busca de cada dica (feita antes do pedido, na vez do jogador)
+HINT_LINES = 3  # Lances candidatos mostrados na dica
+HINT_CACHE_SIZE = 64  # Posições com dica guardada (voltar lances reaproveita)
 
-# Verificar se o executável do Stockfish existe
-if not os.path.exists(ENGINE_PATH):
-    print(f"ERRO: Executável do Stockfish não encontrado em {ENGINE_PATH}")
-    print("Por favor, baixe o Stockfish e coloque o executável na pasta 'engines'.")
-    pygame.quit()
-    sys.exit()
+# Resultados do motor chegam ao loop principal como eventos do pygame
+ENGINE_RESULT_EVENT = pygame.USEREVENT + 1
+
+def post_engine_result(result):
+    pygame.event.post(pygame.event.Event(ENGINE_RESULT_EVENT, result))
+
+def score_text(info):
+    """Avaliação de uma linha do motor do ponto de vista das brancas ("+0.35", "#3")"""
+    score = info["score"].white()
+    if score.is_mate():
+        return f"#{score.mate()}"
+    return f"{score.score() / 100.0:+.2f}"
+
+# Pool e worker: criados por init_engine()
+engine_pool = None
+engine_worker = None
+
+# Avaliações já calculadas, por posição (persistidas entre sessões)
+EVAL_CACHE_PATH = os.path.join(SCRIPT_DIR, "eval_cache.bin")
+eval_cache = EvalCache(EVAL_CACHE_PATH)
+
+# Medição de desempenho (camada com F3); resumo gravado ao sair em JSON ou .csv
+# CHESS_METRICS="" desativa a gravação
+METRICS_PATH = os.environ.get("CHESS_METRICS", os.path.join(SCRIPT_DIR, "metrics.json"))
+metrics = MetricsRecorder()
+
+# Tabelas de finais Syzygy opcionais (arquivos .rtbw/.rtbz); sem a pasta, só o motor
+TABLEBASE_PATH = os.path.join(SCRIPT_DIR, "tablebases")
+tablebase = Tablebase(TABLEBASE_PATH)
 
-try:
-    engine = chess.engine.SimpleEngine.popen_uci(ENGINE_PATH)
-    print("✓ Stockfish carregado com sucesso!")
-except Exception as e:
-    print(f"ERRO ao iniciar o Stockfish: {e}")
+# Banco local de partidas (python game_database.py import ...); sem o arquivo, nada é consultado
+DATABASE_PATH = os.path.join(SCRIPT_DIR, "games.db")
+game_database = GameDatabase(DATABASE_PATH)
+
+# Diário da partida em andamento (retomada após fechar o jogo ou uma queda)
+JOURNAL_PATH = os.path.join(SCRIPT_DIR, "autosave.journal")
+
+def pending_journal():
+    """Diário de uma partida não terminada (cabeçalho, lances, resultado, bytes, meia-jogada) ou None"""
+    journal = GameJournal.read(JOURNAL_PATH)
+    if journal is None or journal[2] is not None:
+        return None
+    return journal
+
+# Livro de aberturas opcional (Polyglot); sem o arquivo o motor joga desde o início
+BOOK_PATH = os.path.join(SCRIPT_DIR, "books", "book.bin")
+opening_book = OpeningBook(BOOK_PATH)
+
+def init_engine():
+    """Inicia o pool do motor e o worker; lança RuntimeError se falhar"""
+    global engine_pool, engine_worker
+    if engine_worker is not None:
+        return engine_pool
+
+    # Sem o executável do Stockfish, usar o motor interno em Python
+    engine_path = ENGINE_PATH
+    if not os.path.exists(ENGINE_PATH):
+        print(f"AVISO: Executável do Stockfish não encontrado em {ENGINE_PATH}")
+        print("Usando o motor interno (mais fraco). Para o Stockfish, coloque o executável na pasta 'engines'.")
+        engine_path = None
+
+    pool = EnginePool(engine_path, ENGINE_POOL_SIZE)
+    try:
+        # Iniciar o primeiro processo já para detectar erros cedo
+        pool.start()
+    except Exception as e:
+        raise RuntimeError(f"Falha ao iniciar o Stockfish: {e}") from e
+    print("✓ Motor interno carregado!" if pool.builtin else "✓ Stockfish carregado com sucesso!")
+
+    engine_pool = pool
+    engine_worker = EngineWorker(engine_pool, post_engine_result)
+    eval_cache.load()
+    return engine_pool
+
+def shutdown():
+    """Encerra o worker, o pygame e o Stockfish"""
+    global engine_pool, engine_worker
+    if engine_worker is not None:
+        engine_worker.stop()
+        engine_worker = None
     pygame.quit()
-    sys.exit()
+    if engine_pool is not None:
+        engine_pool.close()
+        engine_pool = None
+        # O cache só foi lido junto com o motor; salvar antes apagaria o arquivo
+        opening_book.close()
+        tablebase.close()
+        game_database.close()
+        eval_cache.save()
+        if METRICS_PATH:
+            metrics.dump(METRICS_PATH)
 
 class Button:
-    def __init__(self, x, y, width, height, text, action=None, font=font_small):
+    def __init__(self, x, y, width, height, text, action=None, font=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.action = action
         self.hovered = False
-        self.font = font
+        self.font = font or font_small
         
     def draw(self, screen):
         color = BUTTON_HOVER_COLOR if self.hovered else BUTTON_COLOR
         pygame.draw.rect(screen, color, self.rect, border_radius=6)
         pygame.draw.rect(screen, (200, 200, 200), self.rect, 1, border_radius=6)
         
-        text_surf = self.font.render(self.text, True, BUTTON_TEXT_COLOR)
+        text_surf = text_cache.render(self.font, self.text, BUTTON_TEXT_COLOR)
         text_rect = text_surf.get_rect(center=self.rect.center)
         screen.blit(text_surf, text_rect)
         
@@ -115,6 +334,52 @@ class Button:
                 return self.action
         return None
 
+class WidgetLayer:
+    """Widgets criados uma única vez, com índice espacial para hit-test"""
+    CELL_SIZE = 40
+
+    def __init__(self, widgets):
+        self.widgets = list(widgets)
+        self.hovered = None
+        self.grid = {}
+        for widget in self.widgets:
+            rect = widget.rect
+            for cx in range(rect.left // self.CELL_SIZE, (rect.right - 1) // self.CELL_SIZE + 1):
+                for cy in range(rect.top // self.CELL_SIZE, (rect.bottom - 1) // self.CELL_SIZE + 1):
+                    self.grid.setdefault((cx, cy), []).append(widget)
+
+    def hit_test(self, pos):
+        """Widget sob a posição (consulta só a célula do índice)"""
+        for widget in self.grid.get((pos[0] // self.CELL_SIZE, pos[1] // self.CELL_SIZE), ()):
+            if widget.rect.collidepoint(pos):
+                return widget
+        return None
+
+    def hover(self, pos):
+        """Atualiza o hover; devolve apenas os widgets que mudaram"""
+        widget = self.hit_test(pos)
+        if widget is self.hovered:
+            return []
+        changed = [w for w in (self.hovered, widget) if w is not None]
+        if self.hovered is not None:
+            self.hovered.hovered = False
+        if widget is not None:
+            widget.hovered = True
+        self.hovered = widget
+        return changed
+
+    def hovered_index(self):
+        return self.widgets.index(self.hovered) if self.hovered is not None else None
+
+    def click(self, pos):
+        """Ação do widget clicado (ou None)"""
+        widget = self.hit_test(pos)
+        return widget.action if widget is not None else None
+
+    def draw(self, screen):
+        for widget in self.widgets:
+            widget.draw(screen)
+
 class PromotionDialog:
     def __init__(self, color):
         self.color = color
@@ -122,7 +387,7 @@ class PromotionDialog:
         self.running = True
         
         # Definir peças para promoção
-        self.pieces = ['queen', 'rook', 'bishop', 'knight']
+        self.pieces = PROMOTION_PIECES
         
         # Criar botões para cada peça
         self.buttons = []
@@ -139,7 +404,7 @@ class PromotionDialog:
         screen.blit(s, (0, 0))
         
         # Título
-        title = font_medium.render("Escolha uma peça para promoção:", True, TEXT_COLOR)
+        title = text_cache.render(font_medium, "Escolha uma peça para promoção:", TEXT_COLOR)
         screen.blit(title, (WIDTH//2 - title.get_width()//2, HEIGHT//2 - 100))
         
         # Desenhar peças para escolha
@@ -148,9 +413,8 @@ class PromotionDialog:
             
             # Desenhar a peça no botão
             piece_name = f"{'w' if self.color == chess.WHITE else 'b'}_{piece}"
-            if piece_name in PIECE_IMAGES:
-                piece_img = PIECE_IMAGES[piece_name]
-                scaled_img = pygame.transform.smoothscale(piece_img, (60, 60))
+            scaled_img = sprite_cache.get(piece_name, 60)
+            if scaled_img:
                 img_rect = scaled_img.get_rect(center=button.rect.center)
                 screen.blit(scaled_img, img_rect)
     
@@ -166,15 +430,11 @@ class PromotionDialog:
         return None
 
 class Menu:
-    def __init__(self):
-        self.state = "main"  # "main", "difficulty", "color", "load"
+    def __init__(self, resume_available=False):
+        self.state = "main"  # "main", "difficulty", "time", "color", "load"
         
         # Botões principais
-        self.main_buttons = [
-            Button(WIDTH//2 - 100, 150, 200, 50, "Novo Jogo", {"action": "new_game"}),
-            Button(WIDTH//2 - 100, 220, 200, 50, "Carregar Partida", {"action": "load_game"}),
-            Button(WIDTH//2 - 100, 290, 200, 50, "Sair", {"action": "quit"})
-        ]
+        self.set_resume(resume_available)
         
         # Botões de dificuldade
         self.difficulty_buttons = [
@@ -186,21 +446,39 @@ class Menu:
             Button(WIDTH//2 - 100, 390, 200, 40, "Voltar", {"action": "back_to_main"})
         ]
         self.selected_difficulty = 2  # Nível 10 por padrão
+
+        # Botões de controle de tempo (tempo base + incremento)
+        self.time_buttons = [
+            Button(WIDTH//2 - 100, 120 + i * 50, 200, 40, name, {"action": "set_time", "index": i})
+            for i, (name, _, _) in enumerate(TIME_CONTROLS)
+        ]
+        self.time_buttons.append(Button(WIDTH//2 - 100, 140 + len(TIME_CONTROLS) * 50, 200, 40, "Voltar",
+                                        {"action": "back_to_difficulty"}))
+        self.selected_time = 0  # Sem relógio por padrão
         
         # Botões de cor
         self.color_buttons = [
             Button(WIDTH//2 - 150, 200, 130, 50, "Brancas", {"action": "set_color", "color": "white"}),
             Button(WIDTH//2 + 20, 200, 130, 50, "Pretas", {"action": "set_color", "color": "black"}),
-            Button(WIDTH//2 - 100, 300, 200, 40, "Voltar", {"action": "back_to_difficulty"})
+            Button(WIDTH//2 - 100, 300, 200, 40, "Voltar", {"action": "back_to_time"})
         ]
         
         self.difficulty_level = 10
         
+    def set_resume(self, available):
+        """Volta à tela principal, com "Continuar Partida" se houver partida no diário"""
+        self.state = "main"
+        labels = [("Novo Jogo", "new_game"), ("Carregar Partida", "load_game"), ("Sair", "quit")]
+        if available:
+            labels.insert(0, ("Continuar Partida", "resume_game"))
+        self.main_buttons = [Button(WIDTH//2 - 100, 150 + i * 70, 200, 50, text, {"action": action})
+                             for i, (text, action) in enumerate(labels)]
+
     def draw(self, screen, mouse_pos):
         screen.fill(BACKGROUND_COLOR)
         
         # Título
-        title = font_title.render("JOGO DE XADREZ PROFISSIONAL", True, TEXT_COLOR_HIGHLIGHT)
+        title = text_cache.render(font_title, "JOGO DE XADREZ PROFISSIONAL", TEXT_COLOR_HIGHLIGHT)
         screen.blit(title, (WIDTH//2 - title.get_width()//2, 50))
         
         if self.state == "main":
@@ -210,7 +488,7 @@ class Menu:
                 button.draw(screen)
                 
         elif self.state == "difficulty":
-            subtitle = font_large.render("Escolha a Dificuldade", True, TEXT_COLOR)
+            subtitle = text_cache.render(font_large, "Escolha a Dificuldade", TEXT_COLOR)
             screen.blit(subtitle, (WIDTH//2 - subtitle.get_width()//2, 90))
             
             # Destacar botão selecionado
@@ -220,14 +498,42 @@ class Menu:
                 button.check_hover(mouse_pos)
                 button.draw(screen)
                 
+        elif self.state == "time":
+            subtitle = text_cache.render(font_large, "Controle de Tempo", TEXT_COLOR)
+            screen.blit(subtitle, (WIDTH//2 - subtitle.get_width()//2, 90))
+
+            # Destacar botão selecionado
+            self.time_buttons[self.selected_time].hovered = True
+
+            for button in self.time_buttons:
+                button.check_hover(mouse_pos)
+                button.draw(screen)
+
         elif self.state == "color":
-            subtitle = font_large.render("Escolha sua Cor", True, TEXT_COLOR)
+            subtitle = text_cache.render(font_large, "Escolha sua Cor", TEXT_COLOR)
             screen.blit(subtitle, (WIDTH//2 - subtitle.get_width()//2, 150))
             
             for button in self.color_buttons:
                 button.check_hover(mouse_pos)
                 button.draw(screen)
     
+    def current_buttons(self):
+        if self.state == "main":
+            return self.main_buttons
+        elif self.state == "difficulty":
+            return self.difficulty_buttons
+        elif self.state == "time":
+            return self.time_buttons
+        elif self.state == "color":
+            return self.color_buttons
+        return []
+
+    def view_state(self, mouse_pos):
+        """Estado que define a aparência do menu"""
+        hovered = next((i for i, button in enumerate(self.current_buttons())
+                        if button.rect.collidepoint(mouse_pos)), None)
+        return (self.state, self.selected_difficulty, self.selected_time, len(self.main_buttons), hovered)
+
     def handle_event(self, event, mouse_pos):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if self.state == "main":
@@ -237,6 +543,8 @@ class Menu:
                         if result["action"] == "new_game":
                             self.state = "difficulty"
                             return None
+                        elif result["action"] == "resume_game":
+                            return {"action": "resume_game"}
                         elif result["action"] == "load_game":
                             self.state = "load"
                             return {"action": "load_game"}
@@ -250,12 +558,24 @@ class Menu:
                         if result["action"] == "set_difficulty":
                             self.difficulty_level = result["level"]
                             self.selected_difficulty = i
-                            self.state = "color"
+                            self.state = "time"
                             return None
                         elif result["action"] == "back_to_main":
                             self.state = "main"
                             return None
                             
+            elif self.state == "time":
+                for button in self.time_buttons:
+                    result = button.handle_event(event)
+                    if result:
+                        if result["action"] == "set_time":
+                            self.selected_time = result["index"]
+                            self.state = "color"
+                            return None
+                        elif result["action"] == "back_to_difficulty":
+                            self.state = "difficulty"
+                            return None
+
             elif self.state == "color":
                 for button in self.color_buttons:
                     result = button.handle_event(event)
@@ -264,92 +584,135 @@ class Menu:
                             return {
                                 "action": "start_game",
                                 "player_color": chess.WHITE if result["color"] == "white" else chess.BLACK,
-                                "difficulty": self.difficulty_level
+                                "difficulty": self.difficulty_level,
+                                "time_control": self.time_control()
                             }
-                        elif result["action"] == "back_to_difficulty":
-                            self.state = "difficulty"
+                        elif result["action"] == "back_to_time":
+                            self.state = "time"
                             return None
         return None
 
-class Game:
-    def __init__(self, player_color, difficulty_level):
-        self.board = chess.Board()
-        self.player_color = player_color  # chess.WHITE ou chess.BLACK
+    def time_control(self):
+        """(tempo base, incremento) escolhido no menu, ou None sem relógio"""
+        _, base, increment = TIME_CONTROLS[self.selected_time]
+        return None if base is None else (base, increment)
+
+class Game(GameCore):
+    """Partida com interface gráfica e motor (as regras ficam em GameCore)"""
+    def __init__(self, player_color, difficulty_level, time_control=None, board=None):
+        super().__init__(player_color, difficulty_level, board=board, time_control=time_control)
+        self.time_control = time_control  # Mantido ao reiniciar a partida
         self.selected_square = None
-        self.game_over = False
-        self.message = ""
         self.last_move_time = 0
-        self.move_delay = 1.0  # 1 segundo de delay entre jogadas
+        # Intervalo mínimo entre lances (no relógio ele sai do tempo do bot)
+        self.move_delay = 1.0 if time_control is None else QUICK_MOVE_DELAY
         self.valid_moves = []  # Movimentos válidos da peça selecionada
         self.show_valid_moves = True  # Mostrar movimentos válidos
-        self.difficulty_level = difficulty_level  # Armazenar o nível de dificuldade
-        self.last_move = None  # Último movimento realizado
-        self.move_history = []  # Histórico de movimentos
         self.promotion_dialog = None  # Diálogo de promoção
         self.pawn_promotion_move = None  # Movimento de promoção pendente
-        self.analysis_mode = False  # Modo de análise após o fim do jogo
         self.eval_score = 0.0  # Avaliação da posição
+        self.tablebase_entry = None  # Resultado exato da posição atual (tabelas de finais)
+        self.database_stats = game_database.lookup(self.board)  # Lances das partidas do banco nesta posição
         self.thinking = False  # Se o engine está pensando
-        self.suggested_move = None  # Movimento sugerido
+        self.suggested_move = None  # Movimento sugerido (destacado no tabuleiro)
+        self.hint_lines = []  # Textos dos candidatos da dica mostrada
+        self.hints = OrderedDict()  # Hash Zobrist -> candidatos [(lance, SAN, valor)] já calculados
+        self.hint_wanted = False  # O jogador pediu a dica e ela ainda não chegou
+        self.hint_checked = False  # Já se decidiu calcular (ou não) a dica desta posição
+        self.bot_request = None  # Pedido de jogada do bot em andamento
+        self.suggest_request = None  # Pedido de dica em andamento (antecipado ou pedido)
+        self.analysis_request = None  # Análise contínua em andamento (modo análise)
+        self.analysis_lines = []  # Textos das melhores linhas da análise
+        self.ponder_request = None  # Busca da resposta à jogada esperada do jogador
+        self.ponder_move = None  # Jogada esperada do jogador
+        self.ponder_start = 0  # Início da busca de ponder
+        self.ponder_result = None  # Resultado do ponder que terminou antes da jogada
+        self.ready_bot_result = None  # Resposta pronta após acerto do ponder
+        self.bot_deadline = None  # Quando encerrar a busca herdada do ponder
+        self.out_of_book = False  # A partida já saiu do livro de aberturas
+        self.sidebar = WidgetLayer(self.build_sidebar_buttons())  # Botões do painel lateral
+        self.position_facts = None  # (tabuleiro, casa do rei em xeque) da posição atual
+        self.journal = None  # GameJournal da partida (gravação automática)
         
-        # Configurar dificuldade do Stockfish
-        try:
-            engine.configure({"Skill Level": difficulty_level})
-            print(f"✓ Nível de dificuldade configurado para {difficulty_level}.")
-        except Exception as e:
-            print(f"Erro ao configurar dificuldade: {e}")
+        # Concessão própria no pool: a dificuldade não afeta outras partidas
+        self.engine = engine_pool.lease({"Skill Level": difficulty_level})
+        self.hint_engine = engine_pool.lease()  # Dicas com força máxima (a dificuldade é só do bot)
+        print(f"✓ Nível de dificuldade configurado para {difficulty_level}.")
+
+    def square_rect(self, square):
+        """Retângulo da tela ocupado por uma casa"""
+        return board_layer.rects[square]
+
+    def position_changed(self):
+        """Descarta os fatos calculados para a posição anterior"""
+        super().position_changed()
+        self.position_facts = None
+        # A dica mostrada era da posição anterior
+        self.suggested_move = None
+        self.hint_lines = []
+        self.hint_wanted = False
+        self.hint_checked = False
+
+    def check_square(self):
+        """Casa do rei em xeque (ou None), calculada uma vez por posição"""
+        if self.position_facts is None or self.position_facts[0] is not self.board:
+            king = self.board.king(self.board.turn) if self.board.is_check() else None
+            self.position_facts = (self.board, king)
+        return self.position_facts[1]
+
+    def square_state(self, square, check_square):
+        """Tudo o que define a aparência de uma casa (para detectar mudanças)"""
+        return (
+            self.board.piece_at(square),
+            bool(self.last_move and square in (self.last_move.from_square, self.last_move.to_square)),
+            square == self.selected_square,
+            square == check_square,
+            self.show_valid_moves and square in self.valid_moves,
+            bool(self.suggested_move and square in (self.suggested_move.from_square, self.suggested_move.to_square)),
+        )
+
+    def square_states(self):
+        check_square = self.check_square()
+        return [self.square_state(square, check_square) for square in chess.SQUARES]
 
     def draw_board(self, screen):
         # Desenhar tabuleiro (8x8)
-        for row in range(8):
-            for col in range(8):
-                square = chess.square(col, 7 - row)
-                color = LIGHT_SQUARE if (row + col) % 2 == 0 else DARK_SQUARE
-                rect = pygame.Rect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                pygame.draw.rect(screen, color, rect)
-
-                # Destacar último movimento
-                if self.last_move and (square == self.last_move.from_square or square == self.last_move.to_square):
-                    s = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
-                    s.fill(LAST_MOVE_COLOR)
-                    screen.blit(s, rect)
-
-                # Destacar casa selecionada
-                if self.selected_square is not None and square == self.selected_square:
-                    s = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
-                    s.fill(SELECTED_COLOR)
-                    screen.blit(s, rect)
-                
-                # Destacar rei em xeque
-                king_square = self.board.king(self.board.turn)
-                if king_square is not None and self.board.is_check():
-                    if square == king_square:
-                        s = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
-                        s.fill(CHECK_COLOR)
-                        screen.blit(s, rect)
-                
-                # Desenhar círculos para movimentos válidos (menor)
-                if self.show_valid_moves and square in self.valid_moves:
-                    # Desenhar círculo pequeno no centro da casa
-                    center_x = col * TILE_SIZE + TILE_SIZE // 2
-                    center_y = row * TILE_SIZE + TILE_SIZE // 2
-                    radius = 6  # Reduzido de 8 para 6
-                    
-                    # Sombra
-                    pygame.draw.circle(screen, (0, 0, 0, 100), (center_x + 1, center_y + 1), radius)
-                    # Círculo principal
-                    pygame.draw.circle(screen, HIGHLIGHT_COLOR, (center_x, center_y), radius)
-                    pygame.draw.circle(screen, (255, 255, 255), (center_x, center_y), radius, 1)
-
-                # Desenhar peça
-                piece = self.board.piece_at(square)
-                if piece:
-                    piece_name = f"{'w' if piece.color == chess.WHITE else 'b'}_{chess.piece_name(piece.piece_type)}"
-                    if piece_name in PIECE_IMAGES:
-                        image = PIECE_IMAGES[piece_name]
-                        # Redimensionar imagem com anti-aliasing
-                        scaled_image = pygame.transform.smoothscale(image, (TILE_SIZE, TILE_SIZE))
-                        screen.blit(scaled_image, rect.topleft)
+        check_square = self.check_square()
+        for square in chess.SQUARES:
+            self.draw_square(screen, square, check_square)
+
+    def draw_square(self, screen, square, check_square):
+        """Desenha uma casa com destaques e peça; devolve o retângulo desenhado"""
+        rect = board_layer.draw_square_background(screen, square)
+
+        # Destacar último movimento
+        if self.last_move and (square == self.last_move.from_square or square == self.last_move.to_square):
+            screen.blit(board_layer.overlay(LAST_MOVE_COLOR), rect)
+
+        # Destacar casa selecionada
+        if self.selected_square is not None and square == self.selected_square:
+            screen.blit(board_layer.overlay(SELECTED_COLOR), rect)
+
+        # Destacar o lance sugerido
+        if self.suggested_move and square in (self.suggested_move.from_square, self.suggested_move.to_square):
+            screen.blit(board_layer.overlay(SUGGESTION_COLOR), rect)
+
+        # Destacar rei em xeque
+        if square == check_square:
+            screen.blit(board_layer.overlay(CHECK_COLOR), rect)
+
+        # Desenhar círculos para movimentos válidos (menor)
+        if self.show_valid_moves and square in self.valid_moves:
+            screen.blit(board_layer.get_move_dot(), rect)
+
+        # Desenhar peça
+        piece = self.board.piece_at(square)
+        if piece:
+            # Sprite já redimensionado (gerado uma única vez)
+            scaled_image = sprite_cache.get(piece_image_name(piece), TILE_SIZE)
+            if scaled_image:
+                screen.blit(scaled_image, rect.topleft)
+        return rect
 
     def draw_ui(self, screen):
         # Área da UI abaixo do tabuleiro
@@ -359,29 +722,29 @@ class Game:
         
         # Mensagem do jogo
         if self.message:
-            message_text = font_medium.render(self.message, True, TEXT_COLOR_HIGHLIGHT)
+            message_text = text_cache.render(font_medium, self.message, TEXT_COLOR_HIGHLIGHT)
             screen.blit(message_text, (20, TILE_SIZE * 8 + 10))
         else:
             # Mostrar de quem é o turno
             turn_text = "Vez das Brancas" if self.board.turn == chess.WHITE else "Vez das Pretas"
             color = (255, 255, 255) if self.board.turn != self.player_color else TEXT_COLOR_HIGHLIGHT
-            text = font_medium.render(turn_text, True, color)
+            text = text_cache.render(font_medium, turn_text, color)
             screen.blit(text, (20, TILE_SIZE * 8 + 10))
             
             # Indicar se é o turno do jogador
             if self.board.turn == self.player_color and not self.game_over and not self.analysis_mode:
-                player_text = font_small.render("(Seu turno)", True, (100, 255, 100))
+                player_text = text_cache.render(font_small, "(Seu turno)", (100, 255, 100))
                 screen.blit(player_text, (20, TILE_SIZE * 8 + 45))
 
         # Informações do jogo
         info_y = TILE_SIZE * 8 + 80
         if not self.game_over or self.analysis_mode:
             # Mostrar dificuldade correta
-            diff_text = font_small.render(f"Dificuldade: {self.get_difficulty_name()}", True, TEXT_COLOR)
+            diff_text = text_cache.render(font_small, f"Dificuldade: {self.get_difficulty_name()}", TEXT_COLOR)
             screen.blit(diff_text, (20, info_y))
             
             # Mostrar cor do jogador
-            color_text = font_small.render(f"Você joga com: {'Brancas' if self.player_color == chess.WHITE else 'Pretas'}", True, TEXT_COLOR)
+            color_text = text_cache.render(font_small, f"Você joga com: {'Brancas' if self.player_color == chess.WHITE else 'Pretas'}", TEXT_COLOR)
             screen.blit(color_text, (20, info_y + 30))
         
         # Histórico de movimentos
@@ -394,28 +757,95 @@ class Game:
         pygame.draw.line(screen, (100, 100, 100), (BOARD_WIDTH, 0), (BOARD_WIDTH, HEIGHT), 2)
         
         # Título do painel
-        title = font_medium.render("Informações", True, TEXT_COLOR_HIGHLIGHT)
+        title = text_cache.render(font_medium, "Informações", TEXT_COLOR_HIGHLIGHT)
         screen.blit(title, (BOARD_WIDTH + 10, 20))
         
         # Barra de avaliação
         self.draw_evaluation_bar(screen)
+
+        # Relógios
+        if self.clock is not None:
+            self.draw_clocks(screen)
         
         # Botões do painel
+        self.sidebar.draw(screen)
+
+        # Linhas da análise contínua (ou os candidatos da dica)
+        if self.analysis_mode:
+            self.draw_analysis_lines(screen)
+        elif self.hint_lines:
+            self.draw_hint_lines(screen)
+
+        # Partidas do banco que chegaram a esta posição
+        if self.database_stats is not None:
+            self.draw_database_stats(screen)
+
+    def clock_texts(self):
+        """Tempos mostrados no painel (brancas, pretas); mudam no máximo a cada décimo"""
+        if self.clock is None:
+            return None
+        return (ChessClock.format(self.clock.time_left(chess.WHITE)),
+                ChessClock.format(self.clock.time_left(chess.BLACK)))
+
+    def draw_clocks(self, screen):
+        white, black = self.clock_texts()
+        for i, (name, value, color) in enumerate((("Brancas", white, chess.WHITE),
+                                                  ("Pretas", black, chess.BLACK))):
+            active = self.clock.running == color
+            text = text_cache.render(font_small, f"{name} {value}", TEXT_COLOR_HIGHLIGHT if active else TEXT_COLOR)
+            screen.blit(text, (BOARD_WIDTH + 25 + i * 110, 105))
+
+    def draw_analysis_lines(self, screen):
+        y = 410
+        title = text_cache.render(font_small, "Análise:", TEXT_COLOR_HIGHLIGHT)
+        screen.blit(title, (BOARD_WIDTH + 15, y))
+        for i, line in enumerate(self.analysis_lines):
+            text = text_cache.render(font_tiny, line, TEXT_COLOR)
+            screen.blit(text, (BOARD_WIDTH + 15, y + 30 + i * 22))
+
+    def draw_hint_lines(self, screen):
+        y = 410
+        title = text_cache.render(font_small, "Sugestões:", TEXT_COLOR_HIGHLIGHT)
+        screen.blit(title, (BOARD_WIDTH + 15, y))
+        for i, line in enumerate(self.hint_lines):
+            text = text_cache.render(font_tiny, line, TEXT_COLOR)
+            screen.blit(text, (BOARD_WIDTH + 15, y + 30 + i * 22))
+
+    def draw_database_stats(self, screen):
+        y = 530
+        stats = self.database_stats
+        title = text_cache.render(font_small, f"Banco: {stats.games} partidas", TEXT_COLOR_HIGHLIGHT)
+        screen.blit(title, (BOARD_WIDTH + 15, y))
+        for i, entry in enumerate(stats.moves):
+            line = f"{entry.san:<7} {entry.games:>6}  {entry.score(self.board.turn):.0f}%"
+            text = text_cache.render(font_tiny, line, TEXT_COLOR)
+            screen.blit(text, (BOARD_WIDTH + 15, y + 30 + i * 22))
+
+    def draw_sidebar_widget(self, screen, widget):
+        """Redesenha só um botão do painel (mudança de hover)"""
+        pygame.draw.rect(screen, PANEL_BG, widget.rect)
+        widget.draw(screen)
+        return widget.rect
+
+    def build_sidebar_buttons(self):
         button_y = 150
-        buttons = [
+        return [
             Button(BOARD_WIDTH + 25, button_y, 200, 40, "Salvar Partida", {"action": "save_game"}, font_tiny),
             Button(BOARD_WIDTH + 25, button_y + 50, 200, 40, "Sugerir Movimento", {"action": "suggest_move"}, font_tiny),
             Button(BOARD_WIDTH + 25, button_y + 100, 200, 40, "Modo Análise", {"action": "toggle_analysis"}, font_tiny),
             Button(BOARD_WIDTH + 25, button_y + 150, 200, 40, "Reiniciar", {"action": "restart"}, font_tiny),
             Button(BOARD_WIDTH + 25, button_y + 200, 200, 40, "Menu Principal", {"action": "main_menu"}, font_tiny)
         ]
-        
-        mouse_pos = pygame.mouse.get_pos()
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
-            
-        return buttons
+
+    def ui_state(self):
+        """Estado que define a aparência do painel inferior"""
+        return (self.message, self.board.turn, self.game_over, self.analysis_mode,
+                self.difficulty_level, self.player_color, self.ply, self.history_window())
+
+    def sidebar_state(self):
+        """Estado que define a aparência do painel lateral (fora o hover dos botões)"""
+        return (round(self.eval_score, 1), self.analysis_mode, tuple(self.analysis_lines), self.clock_texts(),
+                self.clock is not None and self.clock.running, self.database_stats, tuple(self.hint_lines))
 
     def draw_evaluation_bar(self, screen):
         # Barra de avaliação
@@ -428,7 +858,7 @@ class Game:
         pygame.draw.rect(screen, EVAL_BAR_BG, (bar_x, bar_y, bar_width, bar_height))
         
         # Valor da avaliação (simplificado)
-        eval_text = font_tiny.render(f"Avaliação: {self.eval_score:.1f}", True, TEXT_COLOR)
+        eval_text = text_cache.render(font_tiny, f"Avaliação: {self.eval_score:.1f}", TEXT_COLOR)
         screen.blit(eval_text, (bar_x, bar_y - 25))
         
         # Preenchimento da barra
@@ -439,6 +869,18 @@ class Game:
         # Linha do centro
         pygame.draw.line(screen, (100, 100, 100), (bar_x + bar_width//2, bar_y), (bar_x + bar_width//2, bar_y + bar_height), 1)
 
+    def history_window(self):
+        """Jogadas visíveis do histórico: (primeira linha, textos, linha da posição atual)"""
+        current = self.history_row(self.ply) if self.ply else -1
+        first = max(0, min(self.history_length() - HISTORY_ROWS, current - HISTORY_ROWS // 2))
+        return first, tuple(self.history_entries(first, first + HISTORY_ROWS)), current
+
+    def history_nav_rects(self):
+        """Botões de navegação na linha do título do histórico"""
+        x = BOARD_WIDTH - 30 - len(HISTORY_NAV) * 40
+        return [(pygame.Rect(x + i * 40, TILE_SIZE * 8 + 135, 36, 24), label, action)
+                for i, (label, action) in enumerate(HISTORY_NAV)]
+
     def draw_move_history(self, screen):
         # Fundo do histórico
         history_rect = pygame.Rect(20, TILE_SIZE * 8 + 130, WIDTH - 40, UI_HEIGHT - 140)
@@ -446,28 +888,85 @@ class Game:
         pygame.draw.rect(screen, (100, 100, 100), history_rect, 1, border_radius=5)
         
         # Título do histórico
-        title = font_small.render("Histórico de Movimentos:", True, TEXT_COLOR)
+        title = text_cache.render(font_small, "Histórico de Movimentos:", TEXT_COLOR)
         screen.blit(title, (30, TILE_SIZE * 8 + 135))
+
+        # Navegação (livre no modo de análise; na partida só voltar o lance)
+        for rect, label, action in self.history_nav_rects():
+            enabled = self.analysis_mode or (action == "back" and not self.game_over)
+            pygame.draw.rect(screen, BUTTON_COLOR if enabled else EVAL_BAR_BG, rect, border_radius=4)
+            text = text_cache.render(font_tiny, label, BUTTON_TEXT_COLOR)
+            screen.blit(text, text.get_rect(center=rect.center))
         
-        # Mostrar movimentos
+        # Mostrar as jogadas em volta da posição atual (a atual em destaque)
         y_offset = TILE_SIZE * 8 + 165
-        for i, move_text in enumerate(self.move_history[-8:]):  # Mostrar últimos 8 movimentos
-            text = font_tiny.render(move_text, True, TEXT_COLOR)
+        first, entries, current = self.history_window()
+        for i, move_text in enumerate(entries):
+            color = TEXT_COLOR_HIGHLIGHT if first + i == current and self.ply < len(self.line) - 1 else TEXT_COLOR
+            text = text_cache.render(font_tiny, move_text, color)
             screen.blit(text, (30, y_offset + i * 20))
 
-    def get_difficulty_name(self):
-        # Usar o nível de dificuldade armazenado
-        level = self.difficulty_level
-        if level <= 2:
-            return "Muito Fácil"
-        elif level <= 7:
-            return "Fácil"
-        elif level <= 12:
-            return "Médio"
-        elif level <= 17:
-            return "Difícil"
-        else:
-            return "Muito Difícil"
+    def handle_history_click(self, pos):
+        """Cliques nos botões de navegação e nas jogadas do histórico; devolve True se tratou"""
+        for rect, _, action in self.history_nav_rects():
+            if rect.collidepoint(pos):
+                self.navigate(action)
+                return True
+        y_offset = TILE_SIZE * 8 + 165
+        first, entries, _ = self.history_window()
+        if 20 <= pos[0] < BOARD_WIDTH - 20 and y_offset <= pos[1] < y_offset + len(entries) * 20:
+            if self.analysis_mode:
+                # Ir para a posição depois do último lance da jogada clicada
+                row = first + (pos[1] - y_offset) // 20
+                offset = 1 if self.root_turn == chess.BLACK else 0
+                self.go_to_ply(min(len(self.line_sans), 2 * row + 2 - offset))
+            return True
+        return False
+
+    def handle_key(self, key):
+        """Setas, Home e End navegam pelo histórico"""
+        action = HISTORY_KEYS.get(key)
+        if action is not None:
+            self.navigate(action)
+
+    def navigate(self, action):
+        if not self.analysis_mode:
+            if action == "back" and not self.game_over:
+                self.takeback()
+            return
+        target = {"first": 0, "back": self.ply - 1, "forward": self.ply + 1, "last": len(self.line) - 1}[action]
+        self.go_to_ply(target)
+
+    def takeback(self):
+        """Volta até a última vez em que era a vez do jogador (desfaz a resposta do bot junto)"""
+        target = self.ply - 1
+        while target > 0 and self.turn_at(target) != self.player_color:
+            target -= 1
+        if target >= 0:
+            self.go_to_ply(target)
+
+    def go_to_ply(self, ply):
+        """Vai para a posição depois de `ply` lances da linha (voltar, avançar, ir ao lance)"""
+        if self.promotion_dialog:
+            return False
+        self.cancel_searches()
+        self.stop_ponder()
+        if not self.seek(ply):
+            return False
+        if self.journal is not None:
+            self.journal.seek(self.ply)
+        if self.analysis_mode:
+            self.stop_analysis()
+            self.start_analysis()
+        elif self.clock is not None and not self.game_over:
+            # O relógio passa a correr para quem tem a vez na posição de destino
+            self.clock.stop()
+            self.clock.start(self.board.turn)
+        self.selected_square = None
+        self.valid_moves = []
+        self.last_move_time = time.time()
+        self.update_cached_eval()
+        return True
 
     def handle_click(self, pos):
         if self.board.turn != self.player_color and not self.analysis_mode and not self.game_over:
@@ -485,9 +984,8 @@ class Game:
                 piece = self.board.piece_at(square)
                 if piece and (piece.color == self.player_color or self.analysis_mode):
                     self.selected_square = square
-                    # Calcular movimentos válidos
-                    self.valid_moves = [move.to_square for move in self.board.legal_moves 
-                                      if move.from_square == square]
+                    # Movimentos válidos vêm do índice da posição
+                    self.valid_moves = self.move_index().destinations(square)
             else:
                 # Tentar mover
                 if square == self.selected_square:
@@ -495,16 +993,14 @@ class Game:
                     self.selected_square = None
                     self.valid_moves = []
                 else:
-                    move = chess.Move(self.selected_square, square)
-                    if move in self.board.legal_moves:
+                    index = self.move_index()
+                    if square in index.moves.get(self.selected_square, ()):
+                        move = chess.Move(self.selected_square, square)
                         # Verificar se é movimento de promoção
-                        if self.board.piece_at(self.selected_square).piece_type == chess.PAWN:
-                            if (self.board.turn == chess.WHITE and chess.square_rank(square) == 7) or \
-                               (self.board.turn == chess.BLACK and chess.square_rank(square) == 0):
-                                # Movimento de promoção
-                                self.pawn_promotion_move = move
-                                self.promotion_dialog = PromotionDialog(self.board.turn)
-                                return
+                        if index.is_promotion(self.selected_square, square):
+                            self.pawn_promotion_move = move
+                            self.promotion_dialog = PromotionDialog(self.board.turn)
+                            return
                         
                         # Movimento normal
                         self.execute_move(move)
@@ -515,39 +1011,45 @@ class Game:
 
     def execute_move(self, move):
         """Executa um movimento e atualiza o histórico"""
-        # Converter movimento para notação algébrica
-        move_san = self.board.san(move)
-        
-        # Executar movimento
-        self.board.push(move)
-        self.last_move = move
-        
-        # Adicionar ao histórico
-        move_number = len(self.move_history) // 2 + 1
-        if len(self.move_history) % 2 == 0:
-            self.move_history.append(f"{move_number}. {move_san}")
-        else:
-            self.move_history[-1] += f" {move_san}"
+        # Buscas pendentes ficaram obsoletas com a nova posição
+        if self.bot_request is not None or self.suggest_request is not None:
+            self.cancel_searches()
+
+        move_san = super().execute_move(move)
+
+        # Gravação automática: só enfileira a linha (a escrita é em outra thread)
+        if self.journal is not None:
+            clocks = None
+            if self.clock is not None:
+                clocks = (self.clock.time_left(chess.WHITE), self.clock.time_left(chess.BLACK))
+            self.journal.record(move, round(self.eval_score * 100), clocks)
+            if self.game_over:
+                self.journal.finish(self.game.headers["Result"])
+
+        # O ponder só vale se o jogador fez a jogada esperada
+        if self.ponder_request is not None:
+            if move == self.ponder_move and not self.game_over:
+                self.ponder_hit()
+            else:
+                self.stop_ponder()
+
+        # No modo de análise a busca recomeça na nova posição (a hash do motor é mantida)
+        if self.analysis_mode:
+            self.stop_analysis()
+            self.start_analysis()
         
         # Limpar seleção
         self.selected_square = None
         self.valid_moves = []
         self.last_move_time = time.time()
-        
-        # Verificar fim de jogo
-        if self.board.is_game_over():
-            self.game_over = True
-            self.set_game_result()
+        self.update_cached_eval()
+        return move_san
 
     def handle_promotion(self, piece_type):
         """Trata a promoção de peão"""
         if self.pawn_promotion_move:
             # Criar movimento de promoção
-            promotion_move = chess.Move(
-                self.pawn_promotion_move.from_square,
-                self.pawn_promotion_move.to_square,
-                promotion=getattr(chess, piece_type.upper())
-            )
+            promotion_move = self.promotion_move(self.pawn_promotion_move, piece_type)
             
             # Executar movimento
             self.execute_move(promotion_move)
@@ -555,86 +1057,305 @@ class Game:
             self.promotion_dialog = None
 
     def make_bot_move(self):
-        if ((self.board.turn != self.player_color and not self.game_over) or self.analysis_mode) and \
+        # Tempo esgotado encerra a partida e as buscas dela
+        if self.check_clock():
+            self.cancel_searches()
+            self.stop_ponder()
+            if self.journal is not None:
+                self.journal.finish(self.game.headers["Result"])
+            return
+
+        # Resposta pronta (ponder ou busca rápida) espera o intervalo mínimo entre lances
+        if self.ready_bot_result is not None:
+            if time.time() - self.last_move_time < self.move_delay:
+                return
+            result, self.ready_bot_result = self.ready_bot_result, None
+            self.play_bot_result(result)
+            return
+        if self.bot_deadline is not None and time.time() >= self.bot_deadline:
+            self.bot_deadline = None
+            engine_worker.stop_request(self.bot_request)
+
+        # No modo de análise o jogador move os dois lados; o motor só analisa
+        if self.board.turn != self.player_color and not self.game_over and not self.analysis_mode and \
            not self.promotion_dialog and \
-           time.time() - self.last_move_time >= self.move_delay and \
+           time.time() - self.last_move_time >= QUICK_MOVE_DELAY and \
            not self.thinking:
-            
+
+            # Lance único e posições do livro são respondidos sem usar o motor
+            move = forced_move(self.board)
+            if move is not None:
+                self.execute_move(move)
+                print(f"Lance único: {move}")
+                return
+            # Com poucas peças as tabelas de finais dão o lance perfeito na hora
+            move = tablebase.best_move(self.board)
+            if move is not None:
+                self.execute_move(move)
+                print(f"Tabela de finais: {move}")
+                return
+            if not self.out_of_book:
+                move = opening_book.choose(self.board, self.difficulty_level)
+                if move is not None and move in self.move_index():
+                    self.execute_move(move)
+                    print(f"Livro de aberturas: {move}")
+                    return
+                self.out_of_book = True
+
+            # A busca começa já (o intervalo entre lances corre junto com ela);
+            # o resultado volta por ENGINE_RESULT_EVENT
             print("Stockfish está pensando...")
             self.thinking = True
+            self.bot_request = engine_worker.submit(self.engine, "play", self.board, self.search_limit(), owner=self)
+
+    def search_limit(self):
+        """Limite da busca do bot: nós pelo nível, tempo pelo relógio e pela posição"""
+        score = self.eval_score if self.board.turn == chess.WHITE else -self.eval_score
+        return engine_limit(self.board, self.difficulty_level, self.clock, score)
+
+    def play_bot_result(self, result):
+        """Executa a jogada do bot vinda do motor e começa a pensar na resposta"""
+        self.bot_request = None
+        self.bot_deadline = None
+        self.thinking = False
+        move = result.get("move")
+        if move is not None and move in self.move_index() and not self.promotion_dialog:
+            # Movimentos de promoção já vêm com a peça escolhida pelo Stockfish
+            self.execute_move(move)
+            print(f"Stockfish jogou: {move}")
+            self.start_ponder(result.get("ponder"))
+        elif "error" not in result:
+            print(f"Erro ao fazer movimento do bot: jogada inválida {move}")
+
+    def start_ponder(self, expected_move):
+        """Busca, durante a vez do jogador, a resposta à jogada que ele deve fazer"""
+        if self.difficulty_level < PONDER_MIN_LEVEL or self.analysis_mode or self.game_over:
+            return
+        if expected_move is None or expected_move not in self.move_index():
+            return
+        board = self.board.copy()
+        board.push(expected_move)
+        if board.is_game_over():
+            return
+        self.ponder_move = expected_move
+        self.ponder_start = time.time()
+        self.ponder_result = None
+        limit = chess.engine.Limit(time=PONDER_MAX_TIME, nodes=level_nodes(self.difficulty_level))
+        self.ponder_request = engine_worker.submit(self.engine, "play", board, limit, owner=self)
+
+    def ponder_hit(self):
+        """O jogador fez a jogada esperada: a busca do ponder vira a jogada do bot"""
+        self.bot_request = self.ponder_request
+        self.thinking = True
+        if self.ponder_result is not None:
+            # A busca já terminou: responder na hora
+            self.ready_bot_result = self.ponder_result
+        else:
+            # Completar o tempo normal de busca; se o ponder já passou dele, parar já
+            budget = move_time(self.board, self.clock)
+            remaining = max(0.0, budget - (time.time() - self.ponder_start))
+            self.bot_deadline = time.time() + remaining
+        print(f"Ponder acertou: {self.ponder_move}")
+        self.ponder_request = None
+        self.ponder_move = None
+        self.ponder_result = None
+
+    def stop_ponder(self):
+        """Descarta a busca do ponder (jogada diferente, menu, modo análise...)"""
+        if self.ponder_request is not None:
+            engine_worker.cancel_request(self.ponder_request)
+        self.ponder_request = None
+        self.ponder_move = None
+        self.ponder_result = None
+
+    def handle_engine_result(self, result):
+        """Trata o resultado de uma busca feita pelo EngineWorker"""
+        request_id = result["request_id"]
+        if result["kind"] == "info":
+            if request_id == self.analysis_request:
+                self.update_analysis(result["board"], engine_worker.take_stream(request_id))
+            return
+        if "error" in result:
+            print(f"Erro do motor: {result['error']}")
+        else:
+            # Guardar a avaliação da posição buscada (vale também para repetições)
+            entry = eval_cache.store(result["board"], result["info"])
+            # Só a busca da posição atual muda a barra: o ponder busca uma posição que
+            # ainda não está no tabuleiro e um pedido obsoleto pode escapar do
+            # cancelamento; o valor exato das tabelas de finais prevalece sobre o do motor
+            if entry is not None and result["board"] == self.board and self.tablebase_entry is None:
+                self.eval_score = entry.score / 100.0
+
+        if request_id == self.bot_request:
+            if time.time() - self.last_move_time < self.move_delay:
+                # Busca mais rápida que o intervalo entre lances: jogar depois
+                self.bot_request = None
+                self.ready_bot_result = result
+            else:
+                self.play_bot_result(result)
+
+        elif request_id == self.ponder_request:
+            # O ponder terminou antes da jogada do jogador; guardar para um acerto
+            self.ponder_result = result
+
+        elif request_id == self.suggest_request:
+            self.suggest_request = None
+            hint = self.store_hint(result)
+            if self.hint_wanted:
+                self.show_hint(hint)
+
+        elif request_id == self.analysis_request:
+            # A análise terminou sozinha (ex.: mate encontrado)
+            self.analysis_request = None
+            self.update_analysis(result["board"], result.get("lines"))
+
+    def start_analysis(self):
+        """Inicia a análise contínua (sem limite) da posição atual"""
+        self.analysis_lines = []
+        if self.board.is_game_over():
+            self.analysis_request = None
+            return
+        self.analysis_request = engine_worker.submit(self.engine, "stream", self.board, None, owner=self,
+                                                     multipv=ANALYSIS_MULTIPV)
+
+    def stop_analysis(self):
+        if self.analysis_request is not None:
+            engine_worker.cancel_request(self.analysis_request)
+        self.analysis_request = None
+        self.analysis_lines = []
+
+    def update_analysis(self, board, lines):
+        """Atualiza a barra e as linhas com o último resultado da análise"""
+        if not lines:
+            return
+        entry = eval_cache.store(board, lines[0])
+        if board != self.board:
+            return  # Análise de uma posição anterior que escapou do cancelamento
+        if entry is not None and self.tablebase_entry is None:
+            self.eval_score = entry.score / 100.0
+        texts = []
+        for info in lines:
+            value = score_text(info)
             try:
-                # Obter avaliação da posição
-                info = engine.analyse(self.board, chess.engine.Limit(time=0.1))
-                if "score" in info:
-                    score = info["score"].white().score(mate_score=10000)
-                    self.eval_score = score / 100.0 if score is not None else 0.0
-                
-                # Jogar movimento
-                result = engine.play(self.board, chess.engine.Limit(time=1.0))
-                move = result.move
-                
-                # Verificar se é movimento de promoção
-                if self.board.piece_at(move.from_square).piece_type == chess.PAWN:
-                    if (self.board.turn == chess.WHITE and chess.square_rank(move.to_square) == 7) or \
-                       (self.board.turn == chess.BLACK and chess.square_rank(move.to_square) == 0):
-                        # Converter promoção automática do Stockfish
-                        if move.promotion:
-                            # Executar movimento de promoção
-                            self.execute_move(move)
-                            self.thinking = False
-                            return
-                
-                # Movimento normal
-                self.execute_move(move)
-                print(f"Stockfish jogou: {move}")
-                
-            except Exception as e:
-                print(f"Erro ao fazer movimento do bot: {e}")
-            finally:
-                self.thinking = False
-
-    def set_game_result(self):
-        if self.board.is_checkmate():
-            winner = "Brancas" if not self.board.turn else "Pretas"
-            self.message = f"Xeque-mate! {winner} vencem!"
-        elif self.board.is_stalemate():
-            self.message = "Empate por afogamento!"
-        elif self.board.is_insufficient_material():
-            self.message = "Empate por material insuficiente!"
-        elif self.board.is_seventyfive_moves():
-            self.message = "Empate por regra das 75 jogadas!"
-        elif self.board.is_fivefold_repetition():
-            self.message = "Empate por repetição quádrupla!"
+                variation = board.variation_san(info["pv"][:6])
+            except ValueError:
+                continue
+            texts.append(f"{value} (d{info.get('depth', 0)}) {variation}")
+        self.analysis_lines = texts
+
+    def update_cached_eval(self):
+        """Mostra na hora o que já se sabe da posição atual (tabelas de finais, cache, banco de partidas)"""
+        with metrics.stage("database_lookup"):
+            self.database_stats = game_database.lookup(self.board)
+        self.tablebase_entry = tablebase.probe(self.board)
+        if self.tablebase_entry is not None:
+            self.eval_score = self.tablebase_entry.white_score(self.board.turn)
         else:
-            self.message = f"Jogo terminado: {self.board.result()}"
+            entry = eval_cache.get(self.board)
+            if entry is not None:
+                self.eval_score = entry.score / 100.0
+
+        # No modo de análise o resultado teórico é anunciado antes do fim da partida
+        if self.analysis_mode and not self.board.is_game_over():
+            if self.tablebase_entry is not None:
+                self.message = f"Resultado teórico: {self.tablebase_entry.describe(self.board.turn)}"
+            elif self.message.startswith("Resultado teórico"):
+                self.message = "Modo de análise ativado"
+
+    def cancel_searches(self):
+        """Cancela a jogada do bot e a sugestão pendentes (o ponder e a análise seguem)"""
+        for request_id in (self.bot_request, self.suggest_request):
+            if request_id is not None:
+                engine_worker.cancel_request(request_id)
+        self.bot_request = None
+        self.suggest_request = None
+        self.bot_deadline = None
+        self.ready_bot_result = None
+        self.thinking = False
+
+    def cancel_engine(self):
+        """Cancela as buscas desta partida (reiniciar, menu, carregar)"""
+        engine_worker.cancel(self)
+        self.bot_request = None
+        self.suggest_request = None
+        self.analysis_request = None
+        self.ponder_request = None
+        self.ponder_move = None
+        self.ponder_result = None
+        self.ready_bot_result = None
+        self.bot_deadline = None
+        self.thinking = False
+
+    def start_journal(self, path=JOURNAL_PATH):
+        """Começa a gravar a partida no diário (substitui o diário anterior)"""
+        self.close_journal()
+        root = self.snapshots[0]
+        header = {
+            "player_color": "white" if self.player_color == chess.WHITE else "black",
+            "difficulty": self.difficulty_level,
+            "time_control": list(self.time_control) if self.time_control else None,
+            "fen": root.fen(),
+            "record": self.record_id,
+        }
+        self.journal = GameJournal(path)
+        self.journal.start(header, [node.move for node in self.line[1:]])
+        if self.ply < len(self.line) - 1:
+            self.journal.seek(self.ply)
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    @classmethod
+    def resume_journal(cls, journal, path=JOURNAL_PATH):
+        """Recria a partida do diário refazendo os lances; o diário continua a ser gravado"""
+        header, records, _, size, ply = journal
+        player_color = chess.WHITE if header.get("player_color") == "white" else chess.BLACK
+        time_control = tuple(header["time_control"]) if header.get("time_control") else None
+        game = cls(player_color, header.get("difficulty", 10), time_control, board=chess.Board(header["fen"]))
+        game.record_id = header.get("record", game.record_id)
+        replayed = 0
+        for record in records:
+            try:
+                move = chess.Move.from_uci(record.uci)
+            except ValueError:
+                break
+            if move not in game.board.legal_moves:
+                break
+            # Sem os efeitos de Game.execute_move (motor, diário): só as regras
+            GameCore.execute_move(game, move)
+            replayed += 1
+        # Volta à posição em que a partida estava (o resto da linha continua navegável)
+        ply = min(ply, replayed)
+        GameCore.seek(game, ply)
+        last = records[ply - 1] if ply else None
+        if last is not None and last.eval is not None:
+            game.eval_score = last.eval / 100.0
+        if game.clock is not None:
+            game.clock.stop()
+            if last is not None and last.clocks is not None:
+                game.clock.remaining = {chess.WHITE: last.clocks[0], chess.BLACK: last.clocks[1]}
+            if not game.game_over:
+                game.clock.start(game.board.turn)
+        game.last_move_time = time.time()
+        game.update_cached_eval()
+
+        game.journal = GameJournal(path)
+        if replayed == len(records):
+            game.journal.resume(header.get("started", time.time()), size)
+        else:
+            # Diário com lances inválidos no fim: regravar só a parte válida
+            game.journal.start(header, [node.move for node in game.line[1:]])
+            game.journal.seek(game.ply)
+        print(f"Partida retomada do diário ({replayed} lances)")
+        return game
 
     def save_game(self):
         """Salva a partida atual em formato PGN"""
         try:
             # Criar objeto Game para PGN
-            game = chess.pgn.Game()
-            
-            # Adicionar metadados
-            game.headers["Event"] = "Partida de Xadrez"
-            game.headers["Site"] = "Jogo Local"
-            game.headers["Date"] = datetime.now().strftime("%Y.%m.%d")
-            game.headers["Round"] = "1"
-            game.headers["White"] = "Jogador" if self.player_color == chess.WHITE else "Stockfish"
-            game.headers["Black"] = "Stockfish" if self.player_color == chess.WHITE else "Jogador"
-            game.headers["Result"] = self.board.result()
-            
-            # Adicionar movimentos
-            node = game
-            temp_board = self.board.copy()
-            move_stack = []
-            
-            # Recuperar todos os movimentos
-            while temp_board.move_stack:
-                move_stack.append(temp_board.pop())
-            
-            # Reaplicar movimentos na ordem correta
-            for move in reversed(move_stack):
-                node = node.add_variation(move)
+            game = self.to_pgn()
             
             # Salvar em arquivo usando diálogo
             root = tk.Tk()
@@ -651,6 +1372,10 @@ class Game:
                     exporter = chess.pgn.FileExporter(f)
                     game.accept(exporter)
                 print(f"Partida salva como {filename}")
+                # Com um banco de partidas, a partida salva entra nele (a árvore em memória, não o
+                # arquivo: salvar de novo substitui a versão anterior em vez de duplicá-la)
+                if game_database.available and game_database.add_game(game, self.record_id, filename):
+                    self.update_cached_eval()
                 messagebox.showinfo("Sucesso", f"Partida salva como {filename}")
                 return filename
             return None
@@ -673,11 +1398,8 @@ class Game:
             
             if filename:
                 with open(filename, "r", encoding="utf-8") as f:
-                    game = chess.pgn.read_game(f)
-                    if game:
-                        self.board = game.board()
-                        for move in game.mainline_moves():
-                            self.board.push(move)
+                    if self.load_pgn(f):
+                        self.update_cached_eval()
                         print(f"Partida carregada de {filename}")
                         messagebox.showinfo("Sucesso", f"Partida carregada de {filename}")
                         return True
@@ -688,58 +1410,300 @@ class Game:
             return False
 
     def suggest_move(self):
-        """Obtém uma sugestão de movimento do Stockfish"""
-        try:
-            print("Obtendo sugestão do Stockfish...")
-            self.thinking = True
-            result = engine.play(self.board, chess.engine.Limit(time=2.0))
-            self.suggested_move = result.move
-            print(f"Sugestão: {result.move}")
-            self.thinking = False
-            return result.move
-        except Exception as e:
-            print(f"Erro ao obter sugestão: {e}")
-            self.thinking = False
+        """Mostra a dica da posição: na hora se já foi calculada, senão quando o motor terminar"""
+        key = eval_cache.key(self.board)
+        hint = self.hints.get(key)
+        if hint is not None:
+            self.hints.move_to_end(key)
+            self.show_hint(hint)
             return None
+        self.hint_wanted = True
+        if self.suggest_request is None:
+            print("Obtendo sugestão do Stockfish...")
+            self.request_hint()
+        return self.suggest_request
+
+    def request_hint(self):
+        self.suggest_request = engine_worker.submit(self.hint_engine, "hint", self.board, chess.engine.Limit(time=HINT_TIME),
+                                                    owner=self, multipv=HINT_LINES)
+
+    def prefetch_hint(self):
+        """Na vez do jogador, calcula a dica antes do pedido se algum motor estiver livre"""
+        if self.hint_checked or self.suggest_request is not None:
+            return
+        if self.game_over or self.analysis_mode or self.promotion_dialog or self.board.turn != self.player_color:
+            return
+        # O motor interno roda no processo do jogo: buscar sem pedido tiraria tempo dos quadros
+        if engine_pool.builtin or engine_worker.busy() >= engine_pool.size:
+            return
+        self.hint_checked = True
+        if eval_cache.key(self.board) not in self.hints:
+            self.request_hint()
+
+    def store_hint(self, result):
+        """Guarda os candidatos de uma busca de dica; devolve a lista [(lance, SAN, valor)]"""
+        if "error" in result:
+            return []
+        board = result["board"]
+        lines = result.get("lines") or [result["info"]]
+        hint = []
+        for info in lines:
+            if not info.get("pv") or "score" not in info:
+                continue
+            move = info["pv"][0]
+            hint.append((move, board.san(move), score_text(info)))
+        if hint:
+            self.hints[eval_cache.key(board)] = hint
+            while len(self.hints) > HINT_CACHE_SIZE:
+                self.hints.popitem(last=False)
+        return hint
+
+    def show_hint(self, hint):
+        self.hint_wanted = False
+        self.hint_lines = [f"{i}. {san} {value}" for i, (_, san, value) in enumerate(hint, 1)]
+        self.suggested_move = hint[0][0] if hint else None
+        print(f"Sugestão: {self.suggested_move}")
 
     def toggle_analysis_mode(self):
         """Alterna o modo de análise"""
         self.analysis_mode = not self.analysis_mode
         if self.analysis_mode:
             self.message = "Modo de análise ativado"
+            self.stop_ponder()
+            self.start_analysis()
+            self.update_cached_eval()
+            # O relógio fica parado enquanto se analisa
+            if self.clock is not None:
+                self.clock.stop()
         else:
             self.message = ""
+            self.stop_analysis()
+            if self.clock is not None and not self.game_over:
+                self.clock.start(self.board.turn)
+
+class DirtyRenderer:
+    """Redesenha apenas as regiões da tela que mudaram desde o último quadro"""
+    BOARD_AREA = pygame.Rect(0, 0, BOARD_WIDTH, BOARD_HEIGHT)
+    UI_AREA = pygame.Rect(0, BOARD_HEIGHT, BOARD_WIDTH, HEIGHT - BOARD_HEIGHT)
+    SIDEBAR_AREA = pygame.Rect(BOARD_WIDTH, 0, WIDTH - BOARD_WIDTH, HEIGHT)
+
+    def __init__(self):
+        self.full_redraw = True
+        self.view = None
+        self.square_keys = None
+        self.ui_key = None
+        self.sidebar_key = None
+        self.menu_key = None
+        self.overlay = False
+
+    def invalidate(self):
+        """Força o redesenho completo no próximo quadro"""
+        self.full_redraw = True
+
+    def set_view(self, view):
+        """Troca de tela (menu, nova partida...) exige redesenho completo"""
+        if view != self.view:
+            self.view = view
+            self.full_redraw = True
+
+    def render_menu(self, screen, menu, mouse_pos):
+        menu_key = menu.view_state(mouse_pos)
+        if not self.full_redraw and menu_key == self.menu_key:
+            return []
+        self.full_redraw = False
+        self.menu_key = menu_key
+        menu.draw(screen, mouse_pos)
+        return [screen.get_rect()]
+
+    def render_game(self, screen, game, mouse_pos):
+        """Desenha o que mudou e devolve a lista de retângulos alterados"""
+        overlay = game.promotion_dialog is not None
+        if overlay != self.overlay:
+            self.overlay = overlay
+            self.full_redraw = True
+
+        square_keys = game.square_states()
+        ui_key = game.ui_state()
+        hover_changed = game.sidebar.hover(mouse_pos)
+        sidebar_key = game.sidebar_state()
+
+        if self.full_redraw:
+            self.full_redraw = False
+            self.square_keys, self.ui_key, self.sidebar_key = square_keys, ui_key, sidebar_key
+            screen.fill((0, 0, 0))
+            with metrics.stage("draw_board"):
+                game.draw_board(screen)
+            with metrics.stage("draw_ui"):
+                game.draw_ui(screen)
+            with metrics.stage("draw_sidebar"):
+                game.draw_sidebar(screen)
+            if game.promotion_dialog:
+                game.promotion_dialog.draw(screen)
+            return [screen.get_rect()]
+
+        # Com o diálogo de promoção aberto nada muda por baixo dele
+        if overlay:
+            return []
+
+        rects = []
+        with metrics.stage("draw_squares"):
+            check_square = game.check_square()
+            for square in chess.SQUARES:
+                if square_keys[square] != self.square_keys[square]:
+                    rects.append(game.draw_square(screen, square, check_square))
+        self.square_keys = square_keys
+
+        if ui_key != self.ui_key:
+            self.ui_key = ui_key
+            with metrics.stage("draw_ui"):
+                rects.append(self.redraw_area(screen, self.UI_AREA, game.draw_ui))
+
+        if sidebar_key != self.sidebar_key:
+            self.sidebar_key = sidebar_key
+            with metrics.stage("draw_sidebar"):
+                rects.append(self.redraw_area(screen, self.SIDEBAR_AREA, game.draw_sidebar))
+        else:
+            # Só o hover mudou: redesenhar apenas os botões afetados
+            for widget in hover_changed:
+                rects.append(game.draw_sidebar_widget(screen, widget))
+
+        return rects
+
+    def redraw_area(self, screen, area, draw):
+        """Desenha limitado a uma área para não invadir os painéis vizinhos"""
+        screen.set_clip(area)
+        draw(screen)
+        screen.set_clip(None)
+        return area
+
+class MetricsOverlay:
+    """Resumo das métricas no canto do painel lateral (F3 liga e desliga)"""
+    AREA = pygame.Rect(BOARD_WIDTH + 5, HEIGHT - 215, WIDTH - BOARD_WIDTH - 10, 210)
+    REFRESH = 0.5  # Segundos entre atualizações (a camada não impede o modo ocioso por muito tempo)
+
+    def __init__(self):
+        self.visible = False
+        self.last_draw = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.last_draw = 0
+
+    def lines(self):
+        stages = metrics.stages
+        lines = [
+            f"Quadro p50 {metrics.frames.percentile(0.5):.1f} ms  máx {metrics.frames.max:.0f} ms",
+            f"Trabalho p95 {metrics.work.percentile(0.95):.2f} ms",
+        ]
+        for name in ("draw_board", "draw_squares", "draw_ui", "draw_sidebar", "display_update"):
+            if name in stages:
+                lines.append(f"{name} {stages[name].mean:.2f} ms (n={stages[name].count})")
+        play = metrics.engine.get("play")
+        if play is not None:
+            lines.append(f"Motor p50 {play.percentile(0.5):.0f} ms  p95 {play.percentile(0.95):.0f} ms")
+        lines.append(f"Nós/s {metrics.nps:.0f}")
+        lines.append(f"Alocações/quadro p95 {metrics.allocated.percentile(0.95):.0f}  gc {metrics.gc_collections() - metrics.gc_start}")
+        return lines
+
+    def draw(self, screen, force=False):
+        """Redesenha a camada se for hora (ou se algo foi desenhado por cima); devolve o retângulo"""
+        now = time.time()
+        if not self.visible or (not force and now - self.last_draw < self.REFRESH):
+            return None
+        self.last_draw = now
+        pygame.draw.rect(screen, (20, 20, 25), self.AREA)
+        pygame.draw.rect(screen, (100, 100, 100), self.AREA, 1)
+        for i, line in enumerate(self.lines()):
+            # Números mudam a cada quadro: não vale a pena guardar no TextCache
+            text = font_tiny.render(line, True, (150, 255, 150))
+            screen.blit(text, (self.AREA.x + 6, self.AREA.y + 5 + i * 20))
+        return self.AREA
+
+IDLE_WAIT_MS = 100  # Espera máxima por eventos quando nada muda na tela
 
 def main():
-    menu = Menu()
+    init_display()
+    try:
+        init_engine()
+    except RuntimeError as e:
+        print(f"ERRO: {e}")
+        pygame.quit()
+        sys.exit()
+
+    menu = Menu(pending_journal() is not None)
     game = None
     state = "menu"  # "menu" ou "game"
     
     clock = pygame.time.Clock()
+    renderer = DirtyRenderer()
+    overlay = MetricsOverlay()
+    idle = False
     running = True
     
     while running:
+        if idle:
+            # Nada mudou no último quadro: dormir até chegar um evento
+            event = pygame.event.wait(IDLE_WAIT_MS)
+            events = [event] if event.type != pygame.NOEVENT else []
+            events += pygame.event.get()
+        else:
+            events = pygame.event.get()
+        metrics.begin_frame()
         mouse_pos = pygame.mouse.get_pos()
         
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                # Camada de desempenho
+                overlay.toggle()
+                renderer.invalidate()
+                continue
+            elif event.type == ENGINE_RESULT_EVENT:
+                metrics.engine_result(event.dict)
+                # Resultados de partidas já encerradas são descartados
+                if game is not None and event.owner is game:
+                    game.handle_engine_result(event.dict)
+                continue
             
             if state == "menu":
                 result = menu.handle_event(event, mouse_pos)
                 if result:
                     if result["action"] == "quit":
                         running = False
+                    elif result["action"] == "resume_game":
+                        journal = pending_journal()
+                        if journal is not None:
+                            if game is not None:
+                                game.cancel_engine()
+                                game.close_journal()
+                            game = Game.resume_journal(journal)
+                            state = "game"
+                        else:
+                            menu.set_resume(False)
                     elif result["action"] == "load_game":
                         # Criar uma instância temporária para carregar
                         temp_game = Game(chess.WHITE, 10)
                         if temp_game.load_game():
+                            if game is not None:
+                                game.cancel_engine()
+                                game.close_journal()
                             game = temp_game
+                            game.start_journal()
                             state = "game"
+                        else:
+                            menu.set_resume(pending_journal() is not None)
+                        renderer.invalidate()
                     elif result["action"] == "start_game":
                         player_color = result["player_color"]
                         difficulty = result["difficulty"]
-                        game = Game(player_color, difficulty)
+                        if game is not None:
+                            game.cancel_engine()
+                            game.close_journal()
+                        game = Game(player_color, difficulty, result["time_control"])
+                        game.start_journal()
                         state = "game"
             
             elif state == "game":
@@ -752,53 +1716,63 @@ def main():
                     if event.type == pygame.MOUSEBUTTONDOWN:
                         if event.button == 1:  # Botão esquerdo do mouse
                             # Verificar cliques no painel lateral
-                            sidebar_buttons = game.draw_sidebar(screen)
-                            button_clicked = False
-                            for button in sidebar_buttons:
-                                result = button.handle_event(event)
-                                if result:
-                                    button_clicked = True
-                                    if result["action"] == "save_game":
-                                        game.save_game()
-                                    elif result["action"] == "suggest_move":
-                                        game.suggest_move()
-                                    elif result["action"] == "toggle_analysis":
-                                        game.toggle_analysis_mode()
-                                    elif result["action"] == "restart":
-                                        # Reiniciar com as mesmas configurações
-                                        game = Game(game.player_color, game.difficulty_level)
-                                    elif result["action"] == "main_menu":
-                                        state = "menu"
-                            
-                            # Se não clicou em botão do painel, processar tabuleiro
-                            if not button_clicked:
-                                game.handle_click(event.pos)
+                            result = game.sidebar.click(event.pos)
+                            if result is None:
+                                # Se não clicou em botão do painel nem no histórico, processar tabuleiro
+                                if not game.handle_history_click(event.pos):
+                                    game.handle_click(event.pos)
+                            elif result["action"] == "save_game":
+                                game.save_game()
+                                renderer.invalidate()
+                            elif result["action"] == "suggest_move":
+                                game.suggest_move()
+                            elif result["action"] == "toggle_analysis":
+                                game.toggle_analysis_mode()
+                            elif result["action"] == "restart":
+                                # Reiniciar com as mesmas configurações
+                                game.cancel_engine()
+                                game.close_journal()
+                                game = Game(game.player_color, game.difficulty_level, game.time_control)
+                                game.start_journal()
+                            elif result["action"] == "main_menu":
+                                game.cancel_engine()
+                                game.close_journal()
+                                menu.set_resume(pending_journal() is not None)
+                                state = "menu"
                         elif event.button == 3:  # Botão direito do mouse
                             # Alternar visualização de movimentos válidos
                             game.show_valid_moves = not game.show_valid_moves
+                    elif event.type == pygame.KEYDOWN:
+                        game.handle_key(event.key)
         
-        # Desenhar
+        # Desenhar apenas o que mudou
+        renderer.set_view((state, id(game)))
         if state == "menu":
-            menu.draw(screen, mouse_pos)
+            dirty_rects = renderer.render_menu(screen, menu, mouse_pos)
         elif state == "game":
-            screen.fill((0, 0, 0))
-            game.draw_board(screen)
-            game.draw_ui(screen)
-            sidebar_buttons = game.draw_sidebar(screen)
-            
-            # Desenhar diálogo de promoção se necessário
-            if game.promotion_dialog:
-                game.promotion_dialog.draw(screen)
+            dirty_rects = renderer.render_game(screen, game, mouse_pos)
             
             # Fazer movimento do bot
-            game.make_bot_move()
+            with metrics.stage("make_bot_move"):
+                game.make_bot_move()
+            game.prefetch_hint()
+
+        # A camada de desempenho fica por cima do que acabou de ser desenhado
+        overlay_rect = overlay.draw(screen, force=any(overlay.AREA.colliderect(rect) for rect in dirty_rects))
+        if overlay_rect is not None:
+            dirty_rects.append(overlay_rect)
         
-        pygame.display.flip()
+        if dirty_rects:
+            with metrics.stage("display_update"):
+                pygame.display.update(dirty_rects)
+        idle = not dirty_rects and not events
+        metrics.end_work()
         clock.tick(60)
     
-    # Sair do Pygame e do Stockfish
-    pygame.quit()
-    engine.quit()
+    # Gravar o que falta do diário; sair do Pygame e do Stockfish
+    if game is not None:
+        game.close_journal()
+    shutdown()
     print("Jogo encerrado.")
 
 if __name__ == "__main__":
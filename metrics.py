@@ -0,0 +1,171 @@
+# metrics.py - Medição de desempenho (tempos por etapa, quadros, motor e alocações)
+#
+# Sem dependência do pygame: a interface mostra o resumo numa camada (F3) e
+# grava tudo em JSON ou CSV ao sair, para comparar versões.
+
+import csv
+import gc
+import json
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Limites (ms) das faixas dos histogramas; a última faixa é "acima de 250 ms"
+BUCKETS_MS = (1, 2, 4, 8, 16.7, 33.3, 50, 100, 250)
+
+
+class Histogram:
+    """Contagem por faixa de tempo mais as últimas amostras (para percentis)"""
+    def __init__(self, samples=2000):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def add(self, ms):
+        index = 0
+        while index < len(BUCKETS_MS) and ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.recent.append(ms)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip([f"<={limit}" for limit in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.counts)),
+        }
+
+
+class MetricsRecorder:
+    """Coleta tempos por etapa, tempo de quadro, latência do motor e alocações"""
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}  # nome -> Histogram
+        self.frames = Histogram()  # Intervalo entre quadros (inclui a espera)
+        self.work = Histogram()  # Trabalho de cada quadro (sem a espera do clock)
+        self.engine = {}  # tipo de pedido -> Histogram da latência total
+        self.engine_wait = Histogram()  # Tempo na fila do worker
+        self.engine_nodes = 0
+        self.engine_seconds = 0.0
+        self.allocated = Histogram()  # Blocos alocados (líquido) por quadro (valores em blocos, não ms)
+        self.frame_start = None
+        self.frame_blocks = None
+        self.gc_start = self.gc_collections()
+
+    @staticmethod
+    def gc_collections():
+        return sum(stats["collections"] for stats in gc.get_stats())
+
+    @contextmanager
+    def stage(self, name):
+        """Mede o tempo de um trecho (with metrics.stage("draw_board"): ...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000.0)
+
+    def add(self, name, ms):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = Histogram()
+        histogram.add(ms)
+
+    def begin_frame(self):
+        """Início de um quadro: fecha o anterior e conta as alocações dele"""
+        now = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        if self.frame_start is not None:
+            self.frames.add((now - self.frame_start) * 1000.0)
+            self.allocated.add(max(0, blocks - self.frame_blocks))
+        self.frame_start = now
+        self.frame_blocks = blocks
+
+    def end_work(self):
+        """Fim do trabalho do quadro (antes de esperar pelo próximo)"""
+        if self.frame_start is not None:
+            self.work.add((time.perf_counter() - self.frame_start) * 1000.0)
+
+    def engine_result(self, result):
+        """Registra a latência e os nós de um resultado do EngineWorker"""
+        if "elapsed" not in result:
+            return
+        kind = result["kind"]
+        histogram = self.engine.get(kind)
+        if histogram is None:
+            histogram = self.engine[kind] = Histogram(samples=500)
+        histogram.add((result["wait"] + result["elapsed"]) * 1000.0)
+        self.engine_wait.add(result["wait"] * 1000.0)
+        nodes = result.get("info", {}).get("nodes")
+        if nodes:
+            self.engine_nodes += nodes
+            self.engine_seconds += result["elapsed"]
+
+    @property
+    def nps(self):
+        return self.engine_nodes / self.engine_seconds if self.engine_seconds > 0 else 0.0
+
+    def summary(self):
+        return {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "duration_s": round(time.time() - self.started, 1),
+            "frame": self.frames.summary(),
+            "work": self.work.summary(),
+            "stages": {name: histogram.summary() for name, histogram in sorted(self.stages.items())},
+            "engine": {kind: histogram.summary() for kind, histogram in sorted(self.engine.items())},
+            "engine_wait": self.engine_wait.summary(),
+            "engine_nps": round(self.nps),
+            "allocated_blocks_per_frame": self.allocated.summary(),
+            "gc_collections": self.gc_collections() - self.gc_start,
+        }
+
+    def dump(self, path):
+        """Grava o resumo em JSON ou, se o arquivo terminar em .csv, uma linha por métrica"""
+        summary = self.summary()
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                if os.path.splitext(path)[1].lower() == ".csv":
+                    self.write_csv(f, summary)
+                else:
+                    json.dump(summary, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Erro ao salvar métricas: {e}")
+            return False
+        return True
+
+    @staticmethod
+    def write_csv(f, summary):
+        writer = csv.writer(f)
+        writer.writerow(["metric", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+        rows = [("frame", summary["frame"]), ("work", summary["work"]),
+                ("engine_wait", summary["engine_wait"]),
+                ("allocated_blocks_per_frame", summary["allocated_blocks_per_frame"])]
+        rows += [(f"stage.{name}", value) for name, value in summary["stages"].items()]
+        rows += [(f"engine.{kind}", value) for kind, value in summary["engine"].items()]
+        for name, value in rows:
+            writer.writerow([name, value["count"], value["mean_ms"], value["p50_ms"],
+                             value["p95_ms"], value["p99_ms"], value["max_ms"]])
+        writer.writerow(["engine_nps", "", summary["engine_nps"], "", "", "", ""])
+        writer.writerow(["gc_collections", summary["gc_collections"], "", "", "", "", ""])
@@ -0,0 +1,48 @@
+# opening_book.py - Livro de aberturas Polyglot (.bin) consultado antes do motor
+
+import os
+import random
+
+import chess.polyglot
+
+
+class OpeningBook:
+    """Livro Polyglot lido por mmap (chess.polyglot.open_reader)"""
+    def __init__(self, path, rng=None):
+        self.path = path
+        self.rng = rng or random.Random()
+        self.reader = None
+
+    @property
+    def available(self):
+        return os.path.exists(self.path)
+
+    def open(self):
+        """Abre o livro na primeira consulta; devolve False se não existir"""
+        if self.reader is None:
+            if not self.available:
+                return False
+            try:
+                self.reader = chess.polyglot.open_reader(self.path)
+            except OSError as e:
+                print(f"Erro ao abrir livro de aberturas: {e}")
+                return False
+        return True
+
+    def choose(self, board, level=20):
+        """Escolhe um lance do livro (ou None se a posição não estiver nele)"""
+        if not self.open():
+            return None
+        entries = list(self.reader.find_all(board))
+        if not entries:
+            return None
+        # Pesos elevados a level / 10: nível 0 sorteia por igual, 10 segue os
+        # pesos do livro e 20 favorece os lances principais
+        exponent = max(0, level) / 10.0
+        weights = [entry.weight ** exponent for entry in entries]
+        return self.rng.choices(entries, weights=weights)[0].move
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
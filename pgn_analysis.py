@@ -0,0 +1,188 @@
+# pgn_analysis.py - Análise em lote de arquivos PGN (sem interface gráfica)
+#
+# Uso:
+#   python pgn_analysis.py partidas.pgn -o analise.jsonl [--engines 4] [--time 0.1]
+#   python pgn_analysis.py partidas.pgn -o anotadas.pgn --format pgn --resume
+
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.engine
+import chess.pgn
+
+from engine_pool import EnginePool
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENGINE_PATH = os.path.join(SCRIPT_DIR, "engines", "stockfish.exe")
+MATE_SCORE = 10000
+BLUNDER_THRESHOLD = 200  # Perda mínima (centipeões) para marcar um erro grave
+
+
+def read_games(handle, offset=0):
+    """Lê as partidas uma a uma; devolve (offset inicial, partida, offset seguinte)"""
+    handle.seek(offset)
+    while True:
+        start = handle.tell()
+        game = chess.pgn.read_game(handle)
+        if game is None:
+            return
+        yield start, game, handle.tell()
+
+
+def analyse_game(lease, game, limit, threshold=BLUNDER_THRESHOLD):
+    """Avalia todas as posições de uma partida e marca os erros graves"""
+    board = game.board()
+    moves = list(game.mainline_moves())
+    scores = []
+    for i in range(len(moves) + 1):
+        if board.is_game_over():
+            # Sem lances legais: a avaliação vem do resultado
+            if board.is_checkmate():
+                scores.append(-MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE)
+            else:
+                scores.append(0)
+        else:
+            info = lease.analyse(board, limit)
+            # Sem "score" (ex.: motor interrompido antes da primeira iteração) a posição fica sem nota
+            score = info.get("score")
+            scores.append(score.white().score(mate_score=MATE_SCORE) if score is not None else None)
+        if i < len(moves):
+            board.push(moves[i])
+
+    board = game.board()
+    evaluations = []
+    for i, move in enumerate(moves):
+        # Perda do ponto de vista de quem jogou (None se faltar a nota de uma das posições)
+        if scores[i] is None or scores[i + 1] is None:
+            loss = None
+        else:
+            loss = scores[i] - scores[i + 1] if board.turn == chess.WHITE else scores[i + 1] - scores[i]
+        evaluations.append({
+            "ply": i + 1,
+            "move": board.san(move),
+            "uci": move.uci(),
+            "eval": scores[i + 1],
+            "loss": None if loss is None else max(0, loss),
+            "blunder": loss is not None and loss >= threshold,
+        })
+        board.push(move)
+    return evaluations
+
+
+def annotate_game(game, evaluations):
+    """Copia as avaliações para os comentários da partida (%eval e ??)"""
+    node = game
+    for evaluation in evaluations:
+        node = node.variations[0]
+        if evaluation["eval"] is not None:
+            comment = f"[%eval {evaluation['eval'] / 100.0:.2f}]"
+            node.comment = f"{node.comment} {comment}".strip()
+        if evaluation["blunder"]:
+            node.nags.add(chess.pgn.NAG_BLUNDER)
+    return game
+
+
+class Progress:
+    """Contagem de partidas e posições por segundo"""
+    def __init__(self, every=10):
+        self.every = every
+        self.games = 0
+        self.positions = 0
+        self.start = time.perf_counter()
+
+    def add(self, positions):
+        self.games += 1
+        self.positions += positions
+        if self.every and self.games % self.every == 0:
+            self.report()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(f"{self.games} partidas, {self.positions} posições em {elapsed:.1f} s "
+              f"({self.games / elapsed:.2f} partidas/s, {self.positions / elapsed:.1f} posições/s)",
+              file=sys.stderr)
+
+
+def run(args):
+    state_path = args.output + ".offset"
+    offset = args.offset
+    if args.resume and os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            offset = int(f.read().strip() or 0)
+        print(f"Retomando a partir do byte {offset}", file=sys.stderr)
+    mode = "a" if args.resume or offset else "w"
+
+    if args.depth:
+        limit = chess.engine.Limit(depth=args.depth)
+    else:
+        limit = chess.engine.Limit(time=args.time)
+
+    pool = EnginePool(None if args.engine == "interno" else args.engine, args.engines)
+    pool.start()
+    lease = pool.lease({"Hash": args.hash})
+    progress = Progress(args.report_every)
+    pending = collections.deque()
+
+    def write(out, item):
+        future, start, game, next_offset = item
+        evaluations = future.result()
+        if args.format == "pgn":
+            print(annotate_game(game, evaluations), file=out, end="\n\n")
+        else:
+            record = {"offset": start, "headers": dict(game.headers), "moves": evaluations}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        # Só avança o ponto de retomada depois que a partida foi gravada
+        with open(state_path, "w", encoding="utf-8") as f:
+            f.write(str(next_offset))
+        progress.add(len(evaluations) + 1)
+
+    try:
+        with open(args.input, encoding="utf-8-sig", errors="replace") as pgn, \
+             open(args.output, mode, encoding="utf-8") as out, \
+             ThreadPoolExecutor(max_workers=args.engines) as executor:
+            for count, (start, game, next_offset) in enumerate(read_games(pgn, offset)):
+                if args.limit and count >= args.limit:
+                    break
+                future = executor.submit(analyse_game, lease, game, limit, args.threshold)
+                pending.append((future, start, game, next_offset))
+                # Poucas partidas em memória: a saída segue a ordem do arquivo
+                while len(pending) >= args.engines * 2:
+                    write(out, pending.popleft())
+            while pending:
+                write(out, pending.popleft())
+    finally:
+        for future, *_ in pending:
+            future.cancel()
+        pool.close()
+        progress.report()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Análise em lote de partidas PGN")
+    parser.add_argument("input", help="Arquivo PGN com uma ou mais partidas")
+    parser.add_argument("-o", "--output", required=True, help="Arquivo de saída (.jsonl ou .pgn)")
+    parser.add_argument("--format", choices=["jsonl", "pgn"], default="jsonl")
+    parser.add_argument("--engine", default=DEFAULT_ENGINE_PATH, help="Executável UCI ('interno' para o motor em Python)")
+    parser.add_argument("--engines", type=int, default=os.cpu_count() or 2, help="Processos do motor")
+    parser.add_argument("--time", type=float, default=0.1, help="Segundos por posição")
+    parser.add_argument("--depth", type=int, default=0, help="Profundidade fixa (substitui --time)")
+    parser.add_argument("--hash", type=int, default=16, help="Hash (MB) por processo")
+    parser.add_argument("--threshold", type=int, default=BLUNDER_THRESHOLD, help="Perda (cp) de um erro grave")
+    parser.add_argument("--offset", type=int, default=0, help="Byte inicial no arquivo PGN")
+    parser.add_argument("--resume", action="store_true", help="Continuar de onde a última execução parou")
+    parser.add_argument("--limit", type=int, default=0, help="Número máximo de partidas")
+    parser.add_argument("--report-every", type=int, default=10, help="Partidas entre relatórios")
+    args = parser.parse_args()
+    args.engines = max(1, args.engines)
+    run(args)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,132 @@
+# tablebase.py - Consulta opcional às tabelas de finais Syzygy (chess.syzygy)
+
+import os
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+
+
+class TablebaseEntry:
+    """Resultado exato de uma posição: WDL e DTZ do ponto de vista de quem joga"""
+    __slots__ = ("wdl", "dtz")
+
+    def __init__(self, wdl, dtz):
+        self.wdl = wdl  # 2 vitória, 1 vitória anulada pela regra dos 50, 0 empate, -1, -2
+        self.dtz = dtz  # Lances até zerar a contagem dos 50 (None se só houver WDL)
+
+    def white_score(self, turn):
+        """Avaliação em peões para a barra: vitória/derrota fora da escala, empate 0"""
+        if self.wdl == 0 or self.wdl in (1, -1):
+            score = 0.0
+        else:
+            # Vitórias mais curtas valem um pouco mais
+            score = 50.0 - min(abs(self.dtz or 0), 100) / 10.0
+            if self.wdl < 0:
+                score = -score
+        return score if turn == chess.WHITE else -score
+
+    def describe(self, turn):
+        """Texto do resultado teórico (ex.: "Vitória das Brancas (DTZ 12)")"""
+        if self.wdl in (-1, 0, 1):
+            return "Empate teórico"
+        side_to_move = "Brancas" if turn == chess.WHITE else "Pretas"
+        other = "Pretas" if turn == chess.WHITE else "Brancas"
+        winner = side_to_move if self.wdl > 0 else other
+        text = f"Vitória das {winner}"
+        if self.dtz is not None:
+            text += f" (DTZ {abs(self.dtz)})"
+        return text
+
+
+class Tablebase:
+    """Tabelas Syzygy de um diretório, abertas por mmap na primeira consulta, com cache"""
+    def __init__(self, path, capacity=65536):
+        self.path = path
+        self.capacity = capacity
+        self.tables = None
+        self.max_pieces = 0
+        self.cache = OrderedDict()  # hash Zobrist -> TablebaseEntry (ou None: fora das tabelas)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self):
+        return os.path.isdir(self.path)
+
+    def open(self):
+        """Abre as tabelas (só lê os nomes; os arquivos são mapeados sob demanda)"""
+        if self.tables is None:
+            if not self.available:
+                return False
+            import chess.syzygy  # Só quem tem as tabelas paga a importação
+            try:
+                self.tables = chess.syzygy.open_tablebase(self.path)
+            except OSError as e:
+                print(f"Erro ao abrir tabelas de finais: {e}")
+                return False
+            # Maior número de peças entre as tabelas presentes (ex.: KQvKR.rtbw -> 4)
+            for filename in os.listdir(self.path):
+                name, ext = os.path.splitext(filename)
+                if ext in (".rtbw", ".rtbz") and "v" in name:
+                    self.max_pieces = max(self.max_pieces, len(name) - 1)
+        return True
+
+    def covers(self, board):
+        """Se a posição pode estar nas tabelas (poucas peças e sem roque)"""
+        return chess.popcount(board.occupied) <= self.max_pieces and not board.castling_rights
+
+    def probe(self, board):
+        """WDL/DTZ exatos da posição (ou None se estiver fora das tabelas)"""
+        if not self.open() or not self.covers(board):
+            return None
+        key = chess.polyglot.zobrist_hash(board)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        self.misses += 1
+        try:
+            wdl = self.tables.probe_wdl(board)
+        except KeyError:
+            entry = None  # Tabela ausente para este material
+        else:
+            dtz = self.tables.get_dtz(board)
+            entry = TablebaseEntry(wdl, dtz)
+        self.cache[key] = entry
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        return entry
+
+    def best_move(self, board):
+        """Lance perfeito pelas tabelas (None se a posição não estiver coberta)"""
+        if self.probe(board) is None:
+            return None
+        best, best_key = None, None
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    key = (3, 0, 0)
+                else:
+                    entry = self.probe(board)
+                    if entry is None:
+                        return None
+                    # Resultado para quem jogou, depois zerar a contagem, depois o DTZ
+                    result = -entry.wdl
+                    dtz = abs(entry.dtz or 0)
+                    if result > 0:
+                        key = (result, zeroing, -dtz)  # Ganhar: o caminho mais curto
+                    else:
+                        key = (result, not zeroing, dtz)  # Empatar ou perder: resistir o máximo
+            finally:
+                board.pop()
+            if best_key is None or key > best_key:
+                best, best_key = move, key
+        return best
+
+    def close(self):
+        if self.tables is not None:
+            self.tables.close()
+            self.tables = None
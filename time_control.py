@@ -0,0 +1,123 @@
+# time_control.py - Relógios de xadrez e gestão do tempo do motor (sem interface gráfica)
+
+import time
+
+import chess
+import chess.engine
+
+# Controles de tempo oferecidos no menu: (nome, tempo base em s, incremento em s)
+TIME_CONTROLS = [
+    ("Sem relógio", None, 0),
+    ("Bullet 1+0", 60, 0),
+    ("Blitz 3+2", 180, 2),
+    ("Blitz 5+3", 300, 3),
+    ("Rápida 10+5", 600, 5),
+    ("Rápida 15+10", 900, 10),
+]
+
+DEFAULT_MOVE_TIME = 1.0  # Segundos por jogada sem relógio
+MIN_MOVE_TIME = 0.05  # Nunca responder com menos que isso (exceto lance único)
+MOVE_OVERHEAD = 0.1  # Margem para a comunicação com o motor e o desenho da tela
+MOVES_TO_GO = 30  # Jogadas que o tempo restante ainda precisa cobrir (estimativa)
+
+
+class ChessClock:
+    """Relógio dos dois lados com tempo base e incremento (Fischer)"""
+    def __init__(self, base, increment=0, now=time.monotonic):
+        self.base = base
+        self.increment = increment
+        self.now = now
+        self.remaining = {chess.WHITE: float(base), chess.BLACK: float(base)}
+        self.running = None  # Lado cujo relógio está correndo (None = parado)
+        self.started = 0.0
+
+    def start(self, color):
+        """Liga o relógio de um lado"""
+        self.running = color
+        self.started = self.now()
+
+    def stop(self):
+        """Para o relógio, descontando o tempo de quem estava pensando"""
+        if self.running is not None:
+            self.remaining[self.running] -= self.now() - self.started
+            self.running = None
+
+    def press(self):
+        """Fim do lance de quem estava jogando: soma o incremento e passa a vez"""
+        color = self.running
+        if color is None:
+            return
+        self.stop()
+        if self.remaining[color] > 0:
+            self.remaining[color] += self.increment
+        self.start(not color)
+
+    def time_left(self, color):
+        """Segundos restantes de um lado (contando o lance em andamento)"""
+        left = self.remaining[color]
+        if color == self.running:
+            left -= self.now() - self.started
+        return max(0.0, left)
+
+    def flagged(self):
+        """Lado cujo tempo acabou (ou None)"""
+        if self.running is not None and self.time_left(self.running) <= 0:
+            return self.running
+        return None
+
+    @staticmethod
+    def format(seconds):
+        """Tempo como mm:ss (ou s.d nos últimos 10 segundos)"""
+        if seconds < 10:
+            return f"{seconds:.1f}"
+        seconds = int(seconds)
+        return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def level_nodes(level):
+    """Limite de nós por jogada de cada nível 0-20 (igual em qualquer máquina)"""
+    level = max(0, min(20, int(level)))
+    return int(10000 * 1.3 ** level)  # ~10 mil nós no nível 0, ~1,9 milhão no 20
+
+
+def move_time(board, clock=None, score=None):
+    """Segundos que o motor pode gastar nesta jogada (score: avaliação em peões)"""
+    # Com relógio: tempo restante dividido pelas jogadas que faltam + incremento
+    if clock is None:
+        budget = DEFAULT_MOVE_TIME
+    else:
+        left = clock.time_left(board.turn)
+        # Pelo número da jogada, não pela pilha de lances: board_at() a devolve encurtada
+        moves_to_go = max(10, MOVES_TO_GO - (board.fullmove_number - 1) // 2)
+        budget = left / moves_to_go + clock.increment * 0.75
+
+    # Posições críticas (xeque, muitas capturas) ganham tempo; partidas decididas perdem
+    factor = 1.0
+    if board.is_check():
+        factor *= 1.3
+    captures = sum(1 for move in board.legal_moves if board.is_capture(move))
+    if captures >= 3:
+        factor *= 1.2
+    if score is not None and abs(score) >= 5.0:
+        factor *= 0.6
+    budget *= factor
+
+    if clock is not None:
+        # Nunca arriscar mais que um quarto do tempo restante
+        left = clock.time_left(board.turn)
+        budget = min(budget, left * 0.25 - MOVE_OVERHEAD)
+    return max(MIN_MOVE_TIME, budget)
+
+
+def engine_limit(board, level, clock=None, score=None):
+    """Limite de busca: nós pelo nível e tempo pela gestão do relógio"""
+    return chess.engine.Limit(time=move_time(board, clock, score), nodes=level_nodes(level))
+
+
+def forced_move(board):
+    """O único lance legal da posição (ou None se houver escolha)"""
+    moves = iter(board.legal_moves)
+    move = next(moves, None)
+    if move is None or next(moves, None) is not None:
+        return None
+    return move
@@ -0,0 +1,349 @@
+# tournament.py - Torneio motor contra motor sem interface gráfica (calibração dos níveis)
+#
+# Uso:
+#   python tournament.py 0 5 10 15 20 -o torneio.jsonl --games 100 [--workers 32]
+#   python tournament.py 8 12 --engine interno --pgn torneio.pgn --tc 60+1
+#   python tournament.py 0 2 4 6 8 10 12 14 16 18 20 --pairing adjacent -o calib.jsonl --resume
+#
+# Cada jogador é um nível de habilidade (0-20), opcionalmente com outro motor:
+# "12" usa o motor de --engine; "12:interno" ou "12:/caminho/stockfish" escolhe o motor.
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing.util
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import chess
+import chess.engine
+import chess.pgn
+
+from chess_core import GameCore
+from engine_pool import EnginePool
+from time_control import engine_limit, level_nodes
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENGINE_PATH = os.path.join(SCRIPT_DIR, "engines", "stockfish.exe")
+MAX_PLIES = 400  # Partidas mais longas são declaradas empate
+
+
+def parse_player(spec, default_engine):
+    """'12' ou '12:motor' -> (nível, caminho do motor ou None para o interno)"""
+    level, _, engine = spec.partition(":")
+    engine = engine or default_engine
+    return int(level), None if engine == "interno" else engine
+
+
+def player_name(player):
+    level, engine = player
+    name = f"Nível {level}"
+    if engine is None:
+        return f"{name} (interno)"
+    if engine != DEFAULT_ENGINE_PATH:
+        return f"{name} ({os.path.basename(engine)})"
+    return name
+
+
+def parse_time_control(text):
+    """'60+1' -> (60, 1); vazio -> None (só o limite de nós do nível)"""
+    if not text:
+        return None
+    base, _, increment = text.partition("+")
+    return float(base), float(increment or 0)
+
+
+def pairings(players, mode):
+    """Pares de jogadores (índices) conforme o formato do torneio"""
+    if mode == "gauntlet":
+        return [(0, i) for i in range(1, len(players))]
+    if mode == "adjacent":
+        return [(i, i + 1) for i in range(len(players) - 1)]
+    return list(itertools.combinations(range(len(players)), 2))
+
+
+def schedule(players, mode, games):
+    """Lista de partidas; cada par de partidas repete a abertura com as cores trocadas"""
+    jobs = []
+    for a, b in pairings(players, mode):
+        for n in range(games):
+            white, black = (a, b) if n % 2 == 0 else (b, a)
+            jobs.append({"id": f"{a}-{b}-{n}", "white": white, "black": black, "opening_seed": f"{a}-{b}-{n // 2}"})
+    return jobs
+
+
+# --- Processo de trabalho: um motor por caminho e por cor, reaproveitado entre partidas ---
+
+_pools = {}
+
+
+def _lease(engine_path, level, color):
+    # Processos separados para as brancas e as pretas: um lado nunca aproveita a
+    # tabela de transposição do outro (a hash é limpa a cada partida, ver play_game)
+    pool = _pools.get((engine_path, color))
+    if pool is None:
+        pool = EnginePool(engine_path, 1)
+        pool.start()
+        _pools[(engine_path, color)] = pool
+    return pool.lease({"Skill Level": level})
+
+
+def _close_pools():
+    for pool in _pools.values():
+        pool.close()
+    _pools.clear()
+
+
+def _init_worker():
+    # Encerrar os motores quando o processo de trabalho terminar
+    multiprocessing.util.Finalize(None, _close_pools, exitpriority=10)
+
+
+def random_opening(seed, plies):
+    """Abertura aleatória reproduzível (mesma semente -> mesmos lances)"""
+    rng = random.Random(seed)
+    board = chess.Board()
+    for _ in range(plies):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+    return board.move_stack
+
+
+def play_game(job, players, args):
+    """Joga uma partida e devolve o registro (resultado, lances, latências, nós/s)"""
+    white, black = players[job["white"]], players[job["black"]]
+    leases = {chess.WHITE: _lease(white[1], white[0], chess.WHITE), chess.BLACK: _lease(black[1], black[0], chess.BLACK)}
+    levels = {chess.WHITE: white[0], chess.BLACK: black[0]}
+    stats = {chess.WHITE: {"latency": [], "nodes": 0, "time": 0.0},
+             chess.BLACK: {"latency": [], "nodes": 0, "time": 0.0}}
+
+    core = GameCore(chess.WHITE, white[0], time_control=args.time_control)
+    for move in random_opening(job["opening_seed"], args.random_plies):
+        core.execute_move(move)
+
+    result = None
+    while not core.game_over:
+        if len(core.board.move_stack) >= MAX_PLIES:
+            result = "1/2-1/2"
+            core.message = "Empate por limite de lances"
+            break
+        color = core.board.turn
+        if core.clock is not None:
+            limit = engine_limit(core.board, levels[color], core.clock)
+        else:
+            limit = chess.engine.Limit(nodes=level_nodes(levels[color]))
+        start = time.perf_counter()
+        # game= muda a cada partida: o motor recebe ucinewgame e começa com a hash vazia
+        played = leases[color].play(core.board, limit, info=chess.engine.INFO_BASIC, game=job["id"])
+        elapsed = time.perf_counter() - start
+        if core.check_clock():
+            # Tempo esgotado de quem estava pensando
+            result = "1/2-1/2" if core.board.has_insufficient_material(not color) else \
+                ("0-1" if color == chess.WHITE else "1-0")
+            break
+        stats[color]["latency"].append(elapsed)
+        stats[color]["nodes"] += played.info.get("nodes", 0)
+        stats[color]["time"] += elapsed
+        if played.move is None or played.move not in core.board.legal_moves:
+            core.game_over = True
+            core.message = f"Lance inválido do motor: {played.move}"
+            result = "0-1" if color == chess.WHITE else "1-0"
+            break
+        core.execute_move(played.move)
+
+    if result is None:
+        result = core.board.result(claim_draw=True)
+
+    game = core.to_pgn()
+    game.headers["Event"] = "Torneio de calibração"
+    game.headers["Round"] = job["id"]
+    game.headers["White"] = player_name(white)
+    game.headers["Black"] = player_name(black)
+    game.headers["Result"] = result
+    game.headers["Termination"] = core.message
+    return {
+        "id": job["id"],
+        "white": job["white"],
+        "black": job["black"],
+        "result": result,
+        "plies": len(core.board.move_stack),
+        "termination": core.message,
+        "stats": {"white" if color else "black": value for color, value in stats.items()},
+        "pgn": str(game),
+    }
+
+
+# --- Estatística ---
+
+def score_of(record, player):
+    """Pontos do jogador na partida (1, 0,5 ou 0)"""
+    white_score = {"1-0": 1.0, "0-1": 0.0}.get(record["result"], 0.5)
+    return white_score if record["white"] == player else 1.0 - white_score
+
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_difference(scores):
+    """Diferença de Elo e margem de 95% a partir das pontuações de cada partida"""
+    n = len(scores)
+    mean = sum(scores) / n
+    variance = sum((s - mean) ** 2 for s in scores) / n
+    margin = 1.96 * math.sqrt(variance / n)
+    low, high = elo_from_score(mean - margin), elo_from_score(mean + margin)
+    return elo_from_score(mean), (high - low) / 2
+
+
+def fit_ratings(records, count, iterations=200):
+    """Ratings de todos os jogadores (Bradley-Terry; empate vale meio ponto), o primeiro fixo em 0"""
+    strength = [1.0] * count
+    wins = [0.0] * count
+    games = {}
+    for record in records:
+        a, b = record["white"], record["black"]
+        s = score_of(record, a)
+        wins[a] += s
+        wins[b] += 1 - s
+        games[(a, b)] = games.get((a, b), 0) + 1
+        games[(b, a)] = games.get((b, a), 0) + 1
+    for _ in range(iterations):
+        for i in range(count):
+            denominator = sum(n / (strength[i] + strength[j]) for (p, j), n in games.items() if p == i)
+            if denominator > 0:
+                # Meio ponto extra em cada jogador evita força zero/infinita
+                strength[i] = (wins[i] + 0.5) / (denominator + 1.0 / (strength[i] + 1.0))
+    anchor = strength[0]
+    return [400 * math.log10(value / anchor) for value in strength]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(records, players, out=sys.stdout):
+    print(f"\n{len(records)} partidas", file=out)
+
+    print("\nConfrontos (Elo do primeiro em relação ao segundo, margem de 95%):", file=out)
+    matches = {}
+    for record in records:
+        key = tuple(sorted((record["white"], record["black"])))
+        matches.setdefault(key, []).append(record)
+    for (a, b), games in sorted(matches.items()):
+        scores = [score_of(record, a) for record in games]
+        elo, margin = elo_difference(scores)
+        wins = sum(1 for s in scores if s == 1.0)
+        losses = sum(1 for s in scores if s == 0.0)
+        print(f"  {player_name(players[a]):>22} x {player_name(players[b]):<22} "
+              f"+{wins} ={len(scores) - wins - losses} -{losses}  {elo:+7.1f} ± {margin:.1f}", file=out)
+
+    print("\nEscala calibrada (Elo relativo ao primeiro jogador):", file=out)
+    ratings = fit_ratings(records, len(players))
+    for player, rating in zip(players, ratings):
+        print(f"  {player_name(player):>22} {rating:+8.1f}", file=out)
+
+    print("\nDesempenho do motor:", file=out)
+    for index, player in enumerate(players):
+        latencies, nodes, seconds = [], 0, 0.0
+        for record in records:
+            for side in ("white", "black"):
+                if record[side] == index:
+                    stats = record["stats"][side]
+                    latencies.extend(stats["latency"])
+                    nodes += stats["nodes"]
+                    seconds += stats["time"]
+        if not latencies:
+            continue
+        nps = nodes / seconds if seconds > 0 else 0
+        print(f"  {player_name(player):>22} {nps:10.0f} nós/s  latência p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+              f"p90 {percentile(latencies, 0.9) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms", file=out)
+
+
+def read_records(path):
+    """Partidas já gravadas (para --resume); linhas incompletas são ignoradas"""
+    records = []
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def run(args):
+    players = [parse_player(spec, args.engine) for spec in args.players]
+    jobs = schedule(players, args.pairing, args.games)
+    records = read_records(args.output) if args.resume else []
+    done = {record["id"] for record in records}
+    jobs = [job for job in jobs if job["id"] not in done]
+    if done:
+        print(f"Retomando: {len(done)} partidas já jogadas", file=sys.stderr)
+
+    mode = "a" if args.resume else "w"
+    out = open(args.output, mode, encoding="utf-8") if args.output else None
+    pgn = open(args.pgn, mode, encoding="utf-8") if args.pgn else None
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor:
+            futures = [executor.submit(play_game, job, players, args) for job in jobs]
+            for count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                if pgn is not None:
+                    pgn.write(record["pgn"] + "\n\n")
+                    pgn.flush()
+                del record["pgn"]
+                if out is not None:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                records.append(record)
+                if args.report_every and count % args.report_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"{count}/{len(jobs)} partidas em {elapsed:.0f} s", file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+        if pgn is not None:
+            pgn.close()
+    if records:
+        report(records, players)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Torneio motor contra motor entre níveis de habilidade")
+    parser.add_argument("players", nargs="+", help="Níveis (0-20), opcionalmente 'nível:motor'")
+    parser.add_argument("-o", "--output", help="Resultados (.jsonl), um registro por partida")
+    parser.add_argument("--pgn", help="Arquivo PGN com todas as partidas")
+    parser.add_argument("--engine", default=DEFAULT_ENGINE_PATH, help="Executável UCI ('interno' para o motor em Python)")
+    parser.add_argument("--games", type=int, default=20, help="Partidas por confronto (cores alternadas)")
+    parser.add_argument("--pairing", choices=["round-robin", "gauntlet", "adjacent"], default="round-robin",
+                        help="Todos contra todos, o primeiro contra os demais ou só níveis vizinhos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Processos simultâneos")
+    parser.add_argument("--tc", default="", help="Controle de tempo 'base+incremento' em segundos (padrão: só nós por nível)")
+    parser.add_argument("--random-plies", type=int, default=4, help="Lances aleatórios de abertura")
+    parser.add_argument("--resume", action="store_true", help="Pular as partidas já gravadas em --output")
+    parser.add_argument("--report-every", type=int, default=10, help="Partidas entre relatórios")
+    args = parser.parse_args()
+    if len(args.players) < 2:
+        parser.error("são necessários pelo menos dois jogadores")
+    if args.resume and not args.output:
+        parser.error("--resume exige --output")
+    args.workers = max(1, args.workers)
+    args.time_control = parse_time_control(args.tc)
+    run(args)
+
+
+if __name__ == "__main__":
+    main_cli()